@@ -0,0 +1,116 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+"""
+Compares two benchmark results written by run.py:
+
+    python benchmarks/compare.py base.json new.json -threshold 10
+
+Exits with code 1 if any metric of new results is slower than base by more than threshold percent,
+or if a benchmark or metric of base results is missing in new results, e.g. because its renders failed.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+# metrics where greater value is worse, times are in seconds, memory is shown in MB
+METRICS = ('wall_time', 'sync_time', 'render_time', 'peak_memory')
+
+
+def load(path):
+    data = json.loads(Path(path).read_text(encoding='utf-8'))
+    results = {json.dumps(item['key'], sort_keys=True): item['result'] for item in data['results']}
+    return data['meta'], results
+
+
+def format_key(key):
+    key = json.loads(key)
+    return f"{key['scene']} {key['render_quality']} s={key['max_samples']} " \
+           f"d={key['max_ray_depth']}{' denoise' if key['denoise'] else ''}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare Hydra RPR benchmark results")
+
+    ap.add_argument("base", type=str,
+                    help="Path to base results")
+    ap.add_argument("new", type=str,
+                    help="Path to new results")
+    ap.add_argument("-threshold", required=False, type=float, default=10.0,
+                    help="Regression threshold in percents")
+
+    args = ap.parse_args()
+
+    base_meta, base = load(args.base)
+    new_meta, new = load(args.new)
+
+    print(f"Base: addon {base_meta['addon_version']}, {base_meta['timestamp']}, {base_meta['device']}")
+    print(f"New:  addon {new_meta['addon_version']}, {new_meta['timestamp']}, {new_meta['device']}")
+    if base_meta['device'] != new_meta['device'] or base_meta['resolution'] != new_meta['resolution']:
+        print("WARNING: results were received with different device or resolution")
+
+    print(f"\n{'Benchmark':<48}{'Metric':<14}{'Base':>12}{'New':>12}{'Change':>10}")
+
+    regressions = []
+    for key in sorted(base.keys() & new.keys()):
+        for metric in METRICS:
+            base_val = base[key].get(metric)
+            new_val = new[key].get(metric)
+            if base_val is None:
+                continue
+
+            if new_val is None:
+                # render telemetry is missing when render failed
+                regressions.append((key, metric, None))
+                print(f"{format_key(key):<48}{metric:<14}{'missing in new results':>34} !")
+                continue
+
+            if not base_val:
+                continue
+
+            if metric == 'peak_memory':
+                base_val, new_val = base_val / 2 ** 20, new_val / 2 ** 20
+
+            change = (new_val - base_val) / base_val * 100
+            mark = ""
+            if change > args.threshold:
+                mark = " !"
+                regressions.append((key, metric, change))
+
+            print(f"{format_key(key):<48}{metric:<14}{base_val:>12.2f}{new_val:>12.2f}{change:>9.1f}%{mark}")
+
+    for key in sorted(base.keys() ^ new.keys()):
+        print(f"{format_key(key):<48}present only in {'base' if key in base else 'new'} results")
+        if key in base:
+            regressions.append((key, None, None))
+
+    if regressions:
+        print(f"\n{len(regressions)} regressions above {args.threshold}% or missing results:")
+        for key, metric, change in regressions:
+            if metric is None:
+                print(f"    {format_key(key)}: missing")
+            elif change is None:
+                print(f"    {format_key(key)}: {metric} missing")
+            else:
+                print(f"    {format_key(key)}: {metric} +{change:.1f}%")
+        return 1
+
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+"""
+Headless benchmark of Hydra RPR addon.
+
+Renders procedurally generated scenes with a matrix of render settings and writes JSON results,
+which could be compared between addon builds with compare.py. Run with system python:
+
+    python benchmarks/run.py -blender /opt/blender/blender -output results.json
+
+or directly inside Blender:
+
+    blender -b --factory-startup --python benchmarks/run.py -- -output results.json
+"""
+import argparse
+import itertools
+import json
+import math
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+SCENES = ('instances', 'textures', 'lights', 'volumes')
+
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Hydra RPR benchmark")
+
+    ap.add_argument("-blender", required=False, type=str, default="blender",
+                    help="Path to Blender executable, used when script is run outside of Blender")
+    ap.add_argument("-output", required=True, type=str,
+                    help="Path to JSON file with results")
+    ap.add_argument("-scenes", required=False, type=str, nargs='+', default=SCENES, choices=SCENES,
+                    help="Scenes to render")
+    ap.add_argument("-device", required=False, type=str, default='CPU', choices=('CPU', 'GPU'),
+                    help="Render device")
+    ap.add_argument("-resolution", required=False, type=int, nargs=2, default=(640, 360),
+                    metavar=('X', 'Y'), help="Render resolution")
+    ap.add_argument("-qualities", required=False, type=str, nargs='+', default=('Northstar',),
+                    choices=('Northstar', 'HybridPro'),
+                    help="Render qualities to sweep, HybridPro requires GPU")
+    ap.add_argument("-samples", required=False, type=int, nargs='+', default=(16, 64),
+                    help="Max samples to sweep")
+    ap.add_argument("-ray-depths", required=False, type=int, nargs='+', default=(2, 8),
+                    help="Max ray depths to sweep")
+    ap.add_argument("-denoise", required=False, type=str, nargs='+', default=('off', 'on'),
+                    choices=('off', 'on'), help="Denoise states to sweep")
+    ap.add_argument("-repeat", required=False, type=int, default=1,
+                    help="Number of renders of every combination, the fastest one is stored")
+
+    return ap.parse_args(argv)
+
+
+def run_blender(args, argv):
+    """ Runs this script inside background Blender """
+    cmd = [args.blender, '-b', '--factory-startup', '--python', __file__, '--', *argv]
+    print(f"Running: {' '.join(cmd)}")
+    return subprocess.call(cmd)
+
+
+#
+# SCENES
+#
+def clear_scene(bpy):
+    for collection in (bpy.data.objects, bpy.data.meshes, bpy.data.materials, bpy.data.lights,
+                       bpy.data.cameras, bpy.data.images):
+        for item in list(collection):
+            collection.remove(item)
+
+
+def create_mesh(bpy, name, segments=32):
+    """ Creates UV sphere mesh """
+    verts = [(0.0, 0.0, 1.0)]
+    for i in range(1, segments // 2):
+        phi = math.pi * i / (segments // 2)
+        for j in range(segments):
+            theta = 2 * math.pi * j / segments
+            verts.append((math.sin(phi) * math.cos(theta), math.sin(phi) * math.sin(theta), math.cos(phi)))
+    verts.append((0.0, 0.0, -1.0))
+
+    rings = segments // 2 - 1
+    faces = [(0, 1 + (j + 1) % segments, 1 + j) for j in range(segments)]
+    for i in range(rings - 1):
+        for j in range(segments):
+            a = 1 + i * segments
+            faces.append((a + j, a + (j + 1) % segments, a + segments + (j + 1) % segments, a + segments + j))
+    last = len(verts) - 1
+    a = 1 + (rings - 1) * segments
+    faces.extend((a + j, a + (j + 1) % segments, last) for j in range(segments))
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, [], faces)
+    mesh.update()
+    return mesh
+
+
+def add_object(bpy, scene, name, data, location=(0.0, 0.0, 0.0), scale=1.0):
+    obj = bpy.data.objects.new(name, data)
+    obj.location = location
+    obj.scale = (scale, scale, scale)
+    scene.collection.objects.link(obj)
+    return obj
+
+
+def setup_base(bpy, scene):
+    cam_data = bpy.data.cameras.new("Camera")
+    camera = add_object(bpy, scene, "Camera", cam_data, (0.0, -30.0, 12.0))
+    camera.rotation_euler = (math.radians(70.0), 0.0, 0.0)
+    scene.camera = camera
+
+    ground = create_mesh(bpy, "Ground", 8)
+    add_object(bpy, scene, "Ground", ground, (0.0, 0.0, -100.0), 99.0)
+
+    sun = bpy.data.lights.new("Sun", 'SUN')
+    sun.energy = 3.0
+    add_object(bpy, scene, "Sun", sun).rotation_euler = (math.radians(40.0), 0.0, math.radians(30.0))
+
+
+def scene_instances(bpy, scene):
+    """ Many linked duplicates of a dense mesh """
+    mesh = create_mesh(bpy, "Rock", 64)
+    for i in range(40):
+        for j in range(40):
+            add_object(bpy, scene, f"Rock_{i}_{j}", mesh, (i - 20.0, j - 10.0, 0.0), 0.4)
+
+
+def scene_textures(bpy, scene):
+    """ Objects with large image textures """
+    tex_dir = Path(tempfile.mkdtemp(prefix="hydrarpr_bench_"))
+    for i in range(8):
+        image = bpy.data.images.new(f"Texture_{i}", 4096, 4096, alpha=False, float_buffer=False)
+        image.generated_type = 'COLOR_GRID' if i % 2 else 'UV_GRID'
+        image.filepath_raw = str(tex_dir / f"texture_{i}.png")
+        image.file_format = 'PNG'
+        image.save()
+        # texture is loaded from file, as in real scenes
+        image.source = 'FILE'
+
+        mat = bpy.data.materials.new(f"Material_{i}")
+        mat.use_nodes = True
+        nodes = mat.node_tree.nodes
+        tex_node = nodes.new('ShaderNodeTexImage')
+        tex_node.image = image
+        mat.node_tree.links.new(tex_node.outputs['Color'], nodes['Principled BSDF'].inputs['Base Color'])
+
+        mesh = create_mesh(bpy, f"Sphere_{i}", 64)
+        mesh.materials.append(mat)
+        add_object(bpy, scene, f"Sphere_{i}", mesh, ((i - 3.5) * 2.5, 0.0, 1.0))
+
+
+def scene_lights(bpy, scene):
+    """ Many point and area lights """
+    mesh = create_mesh(bpy, "Sphere", 32)
+    for i in range(10):
+        add_object(bpy, scene, f"Sphere_{i}", mesh, ((i - 4.5) * 2.5, 0.0, 1.0))
+
+    for i in range(200):
+        light = bpy.data.lights.new(f"Light_{i}", 'POINT' if i % 2 else 'AREA')
+        light.energy = 20.0
+        light.color = ((i * 0.37) % 1.0, (i * 0.61) % 1.0, (i * 0.83) % 1.0)
+        add_object(bpy, scene, f"Light_{i}", light,
+                   ((i % 20) - 10.0, (i // 20) - 5.0, 3.0 + (i % 3)))
+
+
+def scene_volumes(bpy, scene):
+    """ Objects with volume materials """
+    mat = bpy.data.materials.new("Volume")
+    mat.use_nodes = True
+    nodes = mat.node_tree.nodes
+    nodes.remove(nodes['Principled BSDF'])
+    volume = nodes.new('ShaderNodeVolumePrincipled')
+    volume.inputs['Density'].default_value = 0.5
+    mat.node_tree.links.new(volume.outputs['Volume'], nodes['Material Output'].inputs['Volume'])
+
+    mesh = create_mesh(bpy, "Cloud", 32)
+    mesh.materials.append(mat)
+    for i in range(5):
+        add_object(bpy, scene, f"Cloud_{i}", mesh, ((i - 2) * 4.0, 0.0, 2.0), 1.8)
+
+
+#
+# BENCHMARK
+#
+def read_telemetry(telemetry_path):
+    return telemetry_path.read_text(encoding='utf-8').splitlines() if telemetry_path.is_file() else []
+
+
+def render(bpy, scene, telemetry_path):
+    lines_count = len(read_telemetry(telemetry_path))
+
+    start_time = time.perf_counter()
+    bpy.ops.render.render(write_still=False)
+    result = {'wall_time': time.perf_counter() - start_time}
+
+    # addon appends performance data of rendered frame as a new line, failed render doesn't append it
+    lines = read_telemetry(telemetry_path)
+    if len(lines) > lines_count:
+        telemetry = json.loads(lines[-1])
+        result |= {key: telemetry[key] for key in ('sync_time', 'render_time', 'max_samples_per_sec',
+                                                   'peak_memory')}
+
+    return result
+
+
+def run_benchmark(args):
+    import bpy
+    import addon_utils
+
+    addon_utils.enable('hydrarpr', default_set=True)
+
+    scene = bpy.context.scene
+    scene.render.engine = 'RPRHydraRenderEngine'
+    scene.render.resolution_x, scene.render.resolution_y = args.resolution
+    scene.render.resolution_percentage = 100
+
+    telemetry_path = Path(tempfile.mkdtemp(prefix="hydrarpr_bench_")) / "telemetry.jsonl"
+    scene.hydra_rpr.telemetry_log = str(telemetry_path)
+
+    settings = scene.hydra_rpr.final
+    settings.device = args.device
+
+    matrix = list(itertools.product(args.qualities, args.samples, args.ray_depths, args.denoise))
+    min_adaptive_samples = settings.min_adaptive_samples
+    results = []
+    for scene_name in args.scenes:
+        clear_scene(bpy)
+        setup_base(bpy, scene)
+        globals()[f"scene_{scene_name}"](bpy, scene)
+
+        for render_quality, max_samples, ray_depth, denoise in matrix:
+            settings.render_quality = render_quality
+            settings.max_samples = max_samples
+            settings.min_adaptive_samples = min(min_adaptive_samples, max_samples)
+            settings.quality.max_ray_depth = ray_depth
+            settings.denoise.enable = denoise == 'on'
+
+            key = {
+                'scene': scene_name,
+                'render_quality': render_quality,
+                'max_samples': max_samples,
+                'max_ray_depth': ray_depth,
+                'denoise': denoise == 'on',
+            }
+            print(f"Rendering: {key}")
+            runs = [render(bpy, scene, telemetry_path) for _ in range(args.repeat)]
+            result = min(runs, key=lambda r: r['wall_time'])
+            print(f"    {result['wall_time']:.2f}s")
+
+            results.append({'key': key, 'result': result})
+
+    output = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'blender_version': bpy.app.version_string,
+            'addon_version': ".".join(str(v) for v in sys.modules['hydrarpr'].bl_info['version']),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'device': args.device,
+            'resolution': list(args.resolution),
+        },
+        'results': results,
+    }
+
+    output_path = Path(args.output).absolute()
+    output_path.write_text(json.dumps(output, indent=2), encoding='utf-8')
+    print(f"Results were written to: {output_path}")
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+
+    try:
+        import bpy
+    except ImportError:
+        return run_blender(args, argv)
+
+    run_benchmark(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,16 +30,22 @@ bl_info = {
 }
 
 
-from . import engine, properties, ui
+from . import engine, instancing, presets, properties, proxies, ui
 
 
 def register():
     engine.register()
     properties.register()
+    presets.register()
+    instancing.register()
+    proxies.register()
     ui.register()
 
 
 def unregister():
     ui.unregister()
+    proxies.unregister()
+    instancing.unregister()
+    presets.unregister()
     properties.unregister()
     engine.unregister()
@@ -0,0 +1,103 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+import bpy
+
+from .utils import log
+
+
+class Checkpoint:
+    """
+    On disk checkpoint of tiled final render. Render passes of finished tiles are written,
+    interrupted render restarts from not finished tiles.
+    """
+
+    def __init__(self, directory, scene, view_layer, key, interval):
+        # every view layer is rendered separately
+        self.path = Path(bpy.path.abspath(directory)) / \
+            f"{bpy.path.clean_name(scene.name)}_{bpy.path.clean_name(view_layer.name)}_{scene.frame_current:04}"
+        # checkpoint is valid only for the same render settings and tiles
+        self.key = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+        self.interval = interval
+
+        self.tiles = set()  # finished tile indices
+        self.pending = {}   # tile index -> {pass name: pixels}
+        self.flush_time = time.perf_counter()
+
+    @property
+    def manifest_path(self):
+        return self.path / "manifest.json"
+
+    def load(self):
+        """ Loads finished tiles, returns their indices """
+        if not self.manifest_path.is_file():
+            return set()
+
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            log.warning("Failed to read checkpoint %s: %s", self.manifest_path, e)
+            return set()
+
+        if manifest.get('key') != self.key:
+            log.info("Render settings were changed, checkpoint %s is discarded", self.path)
+            self.remove()
+            return set()
+
+        self.tiles = {int(index) for index in manifest['tiles']}
+        return set(self.tiles)
+
+    def add_tile(self, index, passes):
+        self.pending[index] = passes
+        if time.perf_counter() - self.flush_time >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """ Writes pending tiles and manifest to disk """
+        if not self.pending:
+            return
+
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            for index, passes in self.pending.items():
+                for name, pixels in passes.items():
+                    np.save(self.path / f"tile{index}_{bpy.path.clean_name(name)}.npy", pixels)
+
+                self.tiles.add(index)
+
+            # manifest is written the last, so it refers only to completely written tiles
+            manifest = {'key': self.key, 'tiles': sorted(self.tiles)}
+            tmp_path = self.manifest_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(manifest), encoding='utf-8')
+            tmp_path.replace(self.manifest_path)
+
+        except OSError as e:
+            log.error("Failed to write checkpoint %s: %s", self.path, e)
+
+        self.pending.clear()
+        self.flush_time = time.perf_counter()
+
+    def read_tile(self, index, name):
+        return np.load(self.path / f"tile{index}_{bpy.path.clean_name(name)}.npy")
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
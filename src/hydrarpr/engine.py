@@ -12,17 +12,186 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ********************************************************************
+import math
 import os
 from pathlib import Path
 import sys
+import time
+import weakref
 
-from pxr import Plug
+import numpy as np
 
 import bpy
 
+from .viewport import ViewportState, FrameTimeGovernor, IdleThrottle, refine_quality
+from .telemetry import FrameTelemetry, sample_rate_key, load_sample_rate, save_sample_rate
+from .checkpoint import Checkpoint
+from . import materialx
+from .texture_cache import use_cached_textures
+from .materials import material_hash
+from .instancing import find_duplicates, duplicates_memory
+from .preview import preview_settings, preview_path, load_preview, save_preview
+from . import proxies
+from .utils import (
+    get_memory_usage,
+    reset_peak_memory,
+    format_memory,
+    parse_cpu_list,
+    get_cpu_affinity,
+    set_cpu_affinity,
+    get_thread_ids,
+    set_thread_affinity,
+    is_window_focused,
+    log,
+)
+
 
 LIBS_DIR = Path(__file__).parent / "libs"
 
+# render passes supported by delegate:
+# (pass name, channels count, channel ids, pass type, HdRpr AOV token, ViewLayer property)
+PASSES = (
+    ('Depth', 1, 'Z', 'VALUE', "depth", 'use_pass_z'),
+    ('Normal', 3, 'XYZ', 'VECTOR', "normal", 'use_pass_normal'),
+    ('Position', 4, 'XYZA', 'VECTOR', "worldCoordinate", 'use_pass_position'),
+    ('Vector', 4, 'XYZW', 'VECTOR', "velocity", 'use_pass_vector'),
+    # internal ids of delegate, they don't match pass_index of Blender objects and materials
+    ('PrimID', 1, 'X', 'VALUE', "primId", 'hydra_rpr.use_pass_prim_id'),
+    ('MaterialID', 1, 'X', 'VALUE', "materialId", 'hydra_rpr.use_pass_material_id'),
+    ('DiffDir', 3, 'RGB', 'COLOR', "directDiffuse", 'use_pass_diffuse_direct'),
+    ('DiffInd', 3, 'RGB', 'COLOR', "indirectDiffuse", 'use_pass_diffuse_indirect'),
+    ('DiffCol', 3, 'RGB', 'COLOR', "albedo", 'use_pass_diffuse_color'),
+    ('GlossDir', 3, 'RGB', 'COLOR', "directReflect", 'use_pass_glossy_direct'),
+    ('GlossInd', 3, 'RGB', 'COLOR', "indirectReflect", 'use_pass_glossy_indirect'),
+    ('Emit', 3, 'RGB', 'COLOR', "emission", 'use_pass_emit'),
+    ('Env', 3, 'RGB', 'COLOR', "background", 'use_pass_environment'),
+    ('AO', 3, 'RGB', 'COLOR', "ao", 'use_pass_ambient_occlusion'),
+    ('Variance', 3, 'RGB', 'COLOR', "variance", 'hydra_rpr.use_pass_variance'),
+)
+
+
+def is_pass_enabled(view_layer, prop):
+    data, _, prop = prop.rpartition('.')
+    return getattr(getattr(view_layer, data) if data else view_layer, prop)
+
+
+def is_velocity_only(scene):
+    return scene.render.use_motion_blur and not scene.hydra_rpr.final.enable_motion_blur
+
+
+def denoise_schedule(denoise, max_samples):
+    """ Returns denoise (min iteration, iteration step) for the denoise schedule """
+    min_iter = min(denoise.min_iter, max_samples)
+
+    if denoise.schedule == 'FINAL':
+        return max_samples, max_samples
+
+    if denoise.schedule == 'LOG':
+        # number of passes grows with log of samples, delegate uses constant step, so passes are
+        # spread evenly and the first one is moved, so the last one lands on max_samples
+        count = math.floor(math.log2(max_samples / min_iter))
+        if count < 1:
+            return max_samples, max_samples
+
+        step = max(math.ceil((max_samples - min_iter) / count), 1)
+        return max(max_samples - count * step, 1), step
+
+    return min_iter, denoise.iter_step
+
+
+def denoise_passes(denoise, max_samples, min_iter, iter_step):
+    if not denoise.enable or min_iter > max_samples:
+        return 0
+
+    return (max_samples - min_iter) // iter_step + 1
+
+
+# timings of delegate plugin registration in seconds, filled on the first engine use
+plugin_timings = {}
+
+
+def register_plugins():
+    """
+    Registers HdRpr plugin on the first engine use instead of addon loading, so Blender sessions
+    which don't render with Hydra RPR don't pay for plugin scan and libraries load.
+    Safe to call several times and after addon reload.
+    """
+    from pxr import Plug
+
+    registry = Plug.Registry()
+    plugin = registry.GetPluginWithName("hdRpr")
+    if plugin and plugin.isLoaded:
+        materialx.load_stdlib_async()
+        return
+
+    libs_path = str(LIBS_DIR / "lib")
+    if libs_path not in os.environ['PATH'].split(os.pathsep):
+        os.environ['PATH'] = os.environ['PATH'] + os.pathsep + libs_path
+
+    python_path = str(LIBS_DIR / "python")
+    if python_path not in sys.path:
+        sys.path.append(python_path)
+
+    if not plugin:
+        start_time = time.perf_counter()
+        registry.RegisterPlugins(str(LIBS_DIR / "plugin"))
+        plugin_timings['scan'] = time.perf_counter() - start_time
+
+        plugin = registry.GetPluginWithName("hdRpr")
+        if not plugin:
+            log.error("HdRpr plugin isn't found in %s", LIBS_DIR / "plugin")
+            return
+
+    start_time = time.perf_counter()
+    plugin.Load()
+    plugin_timings['load'] = time.perf_counter() - start_time
+
+    log.info("HdRpr plugin registered: scan %.3fs, libraries load %.3fs",
+             plugin_timings.get('scan', 0.0), plugin_timings['load'])
+
+    # standard library is shared by all delegates, Sdr registry has to see the registered plugins
+    materialx.load_stdlib_async()
+
+
+# values which reset delegate settings, that were passed before and aren't passed anymore
+REMOVED_SETTING_VALUES = {
+    'rpr:quality:imageFilterRadius': 1.5,
+}
+
+
+def removed_setting_value(key):
+    if key.startswith('aovToken:'):
+        # empty token unmaps render pass
+        return ""
+
+    return REMOVED_SETTING_VALUES.get(key)
+
+
+# render settings which are changed during tiled rendering
+BORDER_PROPS = ('use_border', 'use_crop_to_border', 'border_min_x', 'border_max_x', 'border_min_y', 'border_max_y')
+
+# render border is widened by a fraction of pixel, so float precision doesn't round tile size down
+BORDER_MARGIN = 0.01
+
+# frame side is split at least into this number of tiles if tiling is enabled only by checkpoints
+CHECKPOINT_SPLIT = 2
+
+
+# part of memory budget used by viewport textures, the rest is left for interactive updates
+VIEWPORT_BUDGET_SHARE = 0.5
+
+# viewport engines which render threads are throttled, and engines which render final frame now
+_throttled_engines = weakref.WeakSet()
+_final_renders = weakref.WeakSet()
+# threads started by alive final render engines, they are never throttled by viewport
+_final_render_threads = set()
+# render settings which are derived from samples limited by time limit, they differ between runs
+TIME_LIMITED_SETTINGS = ('rpr:maxSamples', 'rpr:adaptiveSampling:minSamples', 'rpr:denoising:minIter',
+                         'rpr:denoising:iterStep')
+
+# 'CPU Affinity' setting which process was pinned to the last time
+_cpu_affinity = None
+
 
 class RPRHydraRenderEngine(bpy.types.HydraRenderEngine):
     bl_idname = 'RPRHydraRenderEngine'
@@ -33,13 +202,86 @@ class RPRHydraRenderEngine(bpy.types.HydraRenderEngine):
 
     bl_delegate_id = "HdRprPlugin"
 
-    @classmethod
-    def register(cls):
-        os.environ['PATH'] = os.environ['PATH'] + os.pathsep + str(LIBS_DIR / "lib")
-        sys.path.append(str(LIBS_DIR / "python"))
-        Plug.Registry().RegisterPlugins(str(LIBS_DIR / "plugin"))
+    def __init__(self):
+        super().__init__()
+
+        # render settings which were passed to delegate last time, stored per engine type
+        self._render_settings = {}
+
+        self._viewport_state = ViewportState()
+        self._governor = FrameTimeGovernor()
+        self._idle_throttle = IdleThrottle()
+        # threads of process before delegate was created and render threads which are throttled
+        self._threads_before = None
+        self._throttled_threads = None
+        # render threads of viewport delegate found on the first draw, threads started by final render
+        self._render_threads = None
+        self._final_threads = set()
+        # interactive quality values which were passed to delegate last time
+        self._interactive_values = None
+
+        # number of frames rendered by this engine, engine is kept between frames
+        # only with enabled Persistent Data
+        self._frame_count = 0
+
+        self._update_start_time = None
+        # view layer which is rendered, available during update()
+        self._view_layer = None
+        # max samples which were passed to delegate for final render
+        self._max_samples = 0
+        # number of denoise passes scheduled for final render
+        self._denoise_passes = 0
+        # performance data of current final render frame
+        self._telemetry = None
+        # material preview: path where it is cached and pixels loaded from cache
+        self._preview_path = None
+        self._preview_pixels = None
+        # network hashes of materials synced to viewport delegate
+        self._material_hashes = {}
+        # buffer for reading render passes during tiled rendering
+        self._tile_buffer = None
+        # viewport proxy modifiers are enabled for this viewport render
+        self._shows_proxies = False
+
+    def __del__(self):
+        if self._throttled_threads:
+            self._set_low_power(False)
+        if self._shows_proxies:
+            proxies.viewport_stopped()
+        _final_render_threads.difference_update(self._final_threads)
+
+        base_del = getattr(super(), '__del__', None)
+        if base_del:
+            base_del()
+
+    def reset_render_settings(self):
+        """ Forces full resync of render settings on next get_render_settings() call """
+        self._render_settings.clear()
 
     def get_render_settings(self, engine_type):
+        settings = self._get_render_settings(engine_type)
+
+        prev_settings = self._render_settings.get(engine_type)
+        self._render_settings[engine_type] = settings
+        if prev_settings is None:
+            return settings
+
+        # passing only changed settings, delegate could restart rendering on any received setting
+        changed = {key: val for key, val in settings.items()
+                   if key not in prev_settings or prev_settings[key] != val}
+
+        # kept delegate would use stale values of settings which aren't passed anymore
+        for key in prev_settings.keys() - settings.keys():
+            val = removed_setting_value(key)
+            if val is not None:
+                changed[key] = val
+
+        return changed
+
+    def _get_render_settings(self, engine_type):
+        if self.is_preview:
+            return preview_settings(bpy.context.scene.hydra_rpr.final, bpy.context.scene.hydra_rpr.preview)
+
         if engine_type == 'VIEWPORT':
             settings = bpy.context.scene.hydra_rpr.viewport
             quality = settings.interactive_quality
@@ -49,25 +291,38 @@ class RPRHydraRenderEngine(bpy.types.HydraRenderEngine):
 
         denoise = settings.denoise
 
+        max_samples = settings.max_samples
+        if engine_type != 'VIEWPORT':
+            max_samples = self._max_samples = self._time_limited_samples(bpy.context.scene, settings)
+
+        denoise_min_iter, denoise_iter_step = denoise_schedule(denoise, max_samples)
+        if engine_type != 'VIEWPORT':
+            self._denoise_passes = denoise_passes(denoise, max_samples, denoise_min_iter, denoise_iter_step)
+
         result = {
+            'rpr:renderDevice': settings.device,
+            'rpr:cpuThreadCount': settings.cpu_threads,
+
             'rpr:alpha:enable': settings.enable_alpha,
             'rpr:core:renderQuality': settings.render_quality,
             'rpr:core:renderMode': settings.render_mode,
             'rpr:ambientOcclusion:radius': settings.ao_radius,
-            'rpr:maxSamples': settings.max_samples,
-            'rpr:adaptiveSampling:minSamples': settings.min_adaptive_samples,
+            'rpr:maxSamples': max_samples,
+            'rpr:adaptiveSampling:minSamples': min(settings.min_adaptive_samples, max_samples),
             'rpr:adaptiveSampling:noiseTreshold': settings.variance_threshold,
 
             'rpr:denoising:enable': denoise.enable,
-            'rpr:denoising:minIter': denoise.min_iter,
-            'rpr:denoising:iterStep': denoise.iter_step,
+            'rpr:denoising:minIter': denoise_min_iter,
+            'rpr:denoising:iterStep': denoise_iter_step,
         }
 
         if engine_type == 'VIEWPORT':
+            self._interactive_values, _ = self._interactive_quality(quality)
+            max_ray_depth, enable_downscale, resolution_downscale = self._interactive_values
             result |= {
-                'rpr:quality:interactive:rayDepth': quality.max_ray_depth,
-                'rpr:quality:interactive:downscale:enable': quality.enable_downscale,
-                'rpr:quality:interactive:downscale:resolution': quality.resolution_downscale,
+                'rpr:quality:interactive:rayDepth': max_ray_depth,
+                'rpr:quality:interactive:downscale:enable': enable_downscale,
+                'rpr:quality:interactive:downscale:resolution': resolution_downscale,
             }
         else:
             result |= {
@@ -81,25 +336,561 @@ class RPRHydraRenderEngine(bpy.types.HydraRenderEngine):
                 'rpr:quality:radianceClamping': quality.radiance_clamping,
 
                 'aovToken:Combined': "color",
-                'aovToken:Depth': "depth",
-                'aovToken:Normal': "normal",
-                'aovToken:Position': "worldCoordinate",
             }
 
+            scene = bpy.context.scene
+            result['rpr:beautyMotionBlur:enable'] = scene.render.use_motion_blur and settings.enable_motion_blur
+
+            # only enabled passes are mapped, so delegate doesn't allocate and read back unused AOVs
+            view_layer = self._view_layer or bpy.context.view_layer
+            velocity_only = is_velocity_only(scene)
+            result |= {f'aovToken:{name}': aov for name, _, _, _, aov, prop in PASSES
+                       if is_pass_enabled(view_layer, prop) or (name == 'Vector' and velocity_only)}
+
         if settings.render_quality == 'Northstar':
             result['rpr:quality:imageFilterRadius'] = settings.quality.pixel_filter_width
 
         return result
 
+    def _time_limited_samples(self, scene, settings):
+        """
+        Returns max samples which could be rendered within time limit of final render.
+        Sample rate is taken from the previous render with the same resolution and settings,
+        which could be done by another Blender process. Without it 'Max Samples' are used.
+        """
+        if settings.time_limit <= 0.0 or self._update_start_time is None:
+            return settings.max_samples
+
+        width, height = self._resolution(scene)
+        rate = load_sample_rate(sample_rate_key(scene, settings, (width, height)))
+        if not rate:
+            return settings.max_samples
+
+        # scene sync is done before render settings are requested
+        sync_time = time.perf_counter() - self._update_start_time
+        samples = int(rate / (width * height) * (settings.time_limit - sync_time))
+        if samples < settings.max_samples:
+            self.report({'INFO'}, f"Samples are limited to {max(samples, 1)} to fit "
+                                  f"time limit {settings.time_limit:.1f}s")
+
+        return max(min(samples, settings.max_samples), 1)
+
+    def _interactive_quality(self, quality):
+        """ Returns current interactive quality values and whether they are fully refined """
+        values = (quality.max_ray_depth, quality.enable_downscale, quality.resolution_downscale)
+        if quality.enable_target_fps:
+            values = self._governor.apply(*values)
+
+        if quality.enable_progressive_refinement:
+            return refine_quality(self._viewport_state, values,
+                                  quality.navigation_downscale, quality.refinement_time)
+
+        return values, True
+
+    def update(self, data, depsgraph):
+        # with enabled Persistent Data Blender keeps this engine with its delegate during
+        # animation render, delegate receives only changed prims and changed render settings
+        if self._frame_count > 0:
+            self.update_stats("", f"Syncing changes, frame {depsgraph.scene.frame_current}")
+        else:
+            self.update_stats("", "Syncing scene")
+
+        if self.is_preview and self._load_cached_preview(depsgraph):
+            # cached preview is used, scene isn't synced to delegate
+            return
+
+        scene = depsgraph.scene
+        self._telemetry = None if self.is_preview else FrameTelemetry(scene, scene.hydra_rpr.final)
+        reset_peak_memory()
+
+        self._update_start_time = time.perf_counter()
+        register_plugins()
+        self._apply_cpu_affinity(scene)
+        stdlib_wait_time = materialx.wait_stdlib()
+        if self._telemetry:
+            self._telemetry['materialx_load_time'] = materialx.stdlib_load_time
+            self._telemetry['materialx_wait_time'] = stdlib_wait_time
+
+        if not self.engine_ptr:
+            # delegate is created in super().update(), it has to receive all render settings
+            self.reset_render_settings()
+            self._threads_before = get_thread_ids()
+
+        if not self.is_preview:
+            # final render gets all CPUs
+            _final_renders.add(self)
+            for engine in list(_throttled_engines):
+                engine._resume()
+
+        self._view_layer = depsgraph.view_layer
+        try:
+            # previews are small and use the cache only, texture budget is applied to final renders
+            budget = 0 if self.is_preview else int(scene.hydra_rpr.final.memory_budget * 2 ** 30)
+            texture_cache = use_cached_textures(depsgraph, scene.hydra_rpr.texture_cache, 'FINAL', budget,
+                                                not self.engine_ptr)
+            super().update(data, depsgraph)
+        finally:
+            self._view_layer = None
+
+        if texture_cache and texture_cache.hit_rate is not None:
+            self.report({'INFO'}, f"Texture cache hit rate {texture_cache.hit_rate:.0%}")
+
+        if not self.is_preview and self._frame_count == 0:
+            self._report_duplicates(depsgraph)
+
+        if self._telemetry:
+            self._telemetry['sync_time'] = self._telemetry.elapsed()
+            if texture_cache:
+                self._telemetry['texture_cache_hit_rate'] = texture_cache.hit_rate
+
+    def _report_duplicates(self, depsgraph):
+        """ Reports objects which share mesh data, delegate gets separate mesh for each of them """
+        groups = find_duplicates(obj.original for obj in depsgraph.objects)
+        if not groups:
+            return
+
+        self.report({'INFO'}, f"{sum(len(group) for group in groups)} objects share {len(groups)} meshes, "
+                              f"'Instance Duplicates' would save about {format_memory(duplicates_memory(groups))}")
+
+    def _load_cached_preview(self, depsgraph):
+        """ Loads cached preview of unchanged materials, returns True if it is found """
+        self._preview_path = None
+        self._preview_pixels = None
+
+        preview = bpy.context.scene.hydra_rpr.preview
+        if not preview.enable_cache:
+            return False
+
+        self._preview_path = preview_path(depsgraph, preview, self._get_render_settings('FINAL'))
+        width, height = self._resolution(depsgraph.scene)
+        self._preview_pixels = load_preview(self._preview_path, width * height * 4)
+        return self._preview_pixels is not None
+
+    @staticmethod
+    def _resolution(scene):
+        scale = scene.render.resolution_percentage / 100
+        return int(scene.render.resolution_x * scale), int(scene.render.resolution_y * scale)
+
+    def _render_preview(self, depsgraph):
+        if self._preview_pixels is not None:
+            width, height = self._resolution(depsgraph.scene)
+            result = self.begin_result(0, 0, width, height)
+            result.layers[0].passes["Combined"].rect.foreach_set(self._preview_pixels)
+            self.end_result(result)
+            return
+
+        super().render(depsgraph)
+
+        if self._preview_path and not self.test_break():
+            combined = self.get_result().layers[0].passes["Combined"]
+            pixels = np.empty(len(combined.rect) * 4, dtype=np.float32)
+            combined.rect.foreach_get(pixels)
+            save_preview(self._preview_path, pixels)
+
+    def render(self, depsgraph):
+        self._frame_count += 1
+
+        if self.is_preview:
+            self._render_preview(depsgraph)
+            return
+
+        try:
+            self._render_final(depsgraph)
+        finally:
+            _final_renders.discard(self)
+            if self._threads_before is not None:
+                _final_render_threads.difference_update(self._final_threads)
+                self._final_threads = get_thread_ids() - self._threads_before
+                _final_render_threads.update(self._final_threads)
+
+    def _render_final(self, depsgraph):
+        start_time = time.perf_counter()
+
+        settings = depsgraph.scene.hydra_rpr.final
+        checkpoint = None
+        if settings.enable_checkpoints:
+            checkpoint = Checkpoint(settings.checkpoint_dir, depsgraph.scene, depsgraph.view_layer,
+                                    self._checkpoint_key(depsgraph.scene, settings),
+                                    settings.checkpoint_interval)
+
+        width, height = self._resolution(depsgraph.scene)
+        if not (settings.enable_tiles or checkpoint):
+            super().render(depsgraph)
+            rendered_pixels = width * height
+        else:
+            rendered_pixels = self._render_tiles(depsgraph, self._tile_size(depsgraph.scene, settings),
+                                                 checkpoint)
+
+        render_time = time.perf_counter() - start_time
+        if self.test_break():
+            return
+
+        if checkpoint:
+            checkpoint.remove()
+
+        # adaptive sampling could stop pixels earlier, so sample rate is known only without it,
+        # tiles restored from checkpoint aren't counted
+        is_adaptive = settings.variance_threshold > 0.0 and settings.min_adaptive_samples < self._max_samples
+        if rendered_pixels and not is_adaptive:
+            save_sample_rate(sample_rate_key(depsgraph.scene, settings, (width, height)),
+                             self._max_samples * rendered_pixels / render_time)
+
+        if self._denoise_passes:
+            self.report({'INFO'}, f"Denoised {self._denoise_passes} times during "
+                                  f"{self._max_samples} samples")
+
+        telemetry = self._telemetry
+        if not telemetry:
+            return
+
+        telemetry['max_samples'] = self._max_samples
+        telemetry['render_time'] = render_time
+        telemetry['total_time'] = telemetry.elapsed()
+        # scheduled samples, adaptive sampling could render fewer of them
+        telemetry['max_samples_per_sec'] = self._max_samples / render_time
+        telemetry['denoise_passes'] = self._denoise_passes
+        telemetry['mean_variance'] = self._mean_variance(depsgraph)
+        telemetry.update_peak_memory(get_memory_usage()[1])
+
+        self.update_stats("", telemetry.stats_line())
+
+        log_path = depsgraph.scene.hydra_rpr.telemetry_log
+        if log_path:
+            telemetry.write(log_path)
+
+    def _mean_variance(self, depsgraph):
+        """ Returns mean of Variance pass of render result, None if the pass isn't rendered """
+        layer_name = depsgraph.view_layer.name
+        layer = next(layer for layer in self.get_result().layers if layer.name == layer_name)
+        render_pass = next((render_pass for render_pass in layer.passes
+                            if render_pass.name == 'Variance'), None)
+        if not render_pass:
+            return None
+
+        pixels = np.empty(len(render_pass.rect) * render_pass.channels, dtype=np.float32)
+        render_pass.rect.foreach_get(pixels)
+        return float(pixels.mean())
+
+    def _checkpoint_key(self, scene, settings):
+        """ Data which has to match to resume render from checkpoint """
+        render_settings = next((val for engine_type, val in self._render_settings.items()
+                                if engine_type != 'VIEWPORT'), {})
+        denoise = settings.denoise
+        return {
+            # samples are taken from user settings, time limited ones depend on sync time of each run
+            'render_settings': {key: val for key, val in render_settings.items()
+                                if key not in TIME_LIMITED_SETTINGS},
+            'samples': [settings.max_samples, settings.min_adaptive_samples, settings.time_limit,
+                        denoise.min_iter, denoise.iter_step, denoise.schedule],
+            'resolution': [scene.render.resolution_x, scene.render.resolution_y,
+                           scene.render.resolution_percentage],
+            'tile_size': self._tile_size(scene, settings),
+            'blend_file': bpy.data.filepath,
+        }
+
+    def _tile_size(self, scene, settings):
+        """ Checkpoint is written only after a finished tile, so frame isn't rendered as a single tile """
+        if settings.enable_tiles or not settings.enable_checkpoints:
+            return settings.tile_size
+
+        width, height = self._resolution(scene)
+        return max(min(settings.tile_size, -(-max(width, height) // CHECKPOINT_SPLIT)), 1)
+
+    def _render_tiles(self, depsgraph, tile_size, checkpoint=None):
+        """
+        Renders frame by tiles one after another. Render border of evaluated scene crops camera
+        window of delegate to the tile, so delegate allocates AOVs only of tile size. Hydra engine
+        writes rendered border to the corner of render result, every tile is moved from there
+        to its place, the corner tile is rendered the last. Scene is synced once in update().
+        With checkpoint finished tiles are restored from disk instead of rendering.
+        Returns number of rendered pixels.
+        """
+        render = depsgraph.scene.render
+        width, height = self._resolution(depsgraph.scene)
+        if render.use_border:
+            # tiling isn't combined with user defined render border
+            if checkpoint:
+                self.report({'WARNING'}, "Checkpoints aren't supported with render region")
+            super().render(depsgraph)
+            return width * height
+
+        tiles = [(x, y, min(tile_size, width - x), min(tile_size, height - y))
+                 for y in range(0, height, tile_size) for x in range(0, width, tile_size)]
+
+        if checkpoint and len(tiles) == 1:
+            self.report({'WARNING'}, "Frame is rendered as a single tile, checkpoint is written only "
+                                     "after the whole frame. Decrease Tile Size")
+
+        finished = checkpoint.load() if checkpoint else set()
+        if finished:
+            self.report({'INFO'}, f"Resuming from checkpoint {checkpoint.path}: "
+                                  f"{len(finished)}/{len(tiles)} tiles are finished")
+
+        rendered_pixels = 0
+        prev_border = {prop: getattr(render, prop) for prop in BORDER_PROPS}
+        render.use_border = True
+        render.use_crop_to_border = False
+        try:
+            for count, i in enumerate(reversed(range(len(tiles))), 1):
+                if self.test_break():
+                    break
+
+                x, y, w, h = tiles[i]
+                if i in finished:
+                    self._restore_tile(depsgraph, checkpoint, i, tiles[i])
+                    self.update_progress(count / len(tiles))
+                    continue
+
+                render.border_min_x = max((x - BORDER_MARGIN) / width, 0.0)
+                render.border_max_x = min((x + w + BORDER_MARGIN) / width, 1.0)
+                render.border_min_y = max((y - BORDER_MARGIN) / height, 0.0)
+                render.border_max_y = min((y + h + BORDER_MARGIN) / height, 1.0)
+
+                self.update_stats("", f"Rendering tile {count}/{len(tiles)}")
+                if self._telemetry:
+                    self._telemetry.update_peak_memory(get_memory_usage()[1])
+                reset_peak_memory()
+
+                super().render(depsgraph)
+
+                _, peak_memory = get_memory_usage()
+                if self._telemetry:
+                    self._telemetry.update_peak_memory(peak_memory)
+                    if self._telemetry['time_to_first_pixel'] is None:
+                        self._telemetry['time_to_first_pixel'] = self._telemetry.elapsed()
+
+                if self.test_break():
+                    break
+
+                rendered_pixels += w * h
+                if checkpoint or (x, y) != (0, 0):
+                    passes = self._read_corner(depsgraph, (width, height), tiles[i])
+                    if (x, y) != (0, 0):
+                        self._write_tile(depsgraph, tiles[i], passes)
+
+                    if checkpoint:
+                        checkpoint.add_tile(i, passes)
+
+                self.report({'INFO'}, f"Tile {count}/{len(tiles)} ({w}x{h}): "
+                                      f"peak memory {format_memory(peak_memory)}")
+                self.update_progress(count / len(tiles))
+
+        finally:
+            for prop, val in prev_border.items():
+                setattr(render, prop, val)
+
+            self._tile_buffer = None
+            if checkpoint:
+                checkpoint.flush()
+
+        return rendered_pixels
+
+    def _read_corner(self, depsgraph, resolution, tile):
+        """
+        Returns pixels of tile by pass name, which Hydra engine has written to the corner of render result.
+        Render pass is read only as a whole, the same buffer is reused for all passes and tiles.
+        """
+        width, height = resolution
+        _, _, w, h = tile
+        layer_name = depsgraph.view_layer.name
+        layer = next(layer for layer in self.get_result().layers if layer.name == layer_name)
+
+        passes = {}
+        for render_pass in layer.passes:
+            size = width * height * render_pass.channels
+            if self._tile_buffer is None or len(self._tile_buffer) < size:
+                self._tile_buffer = np.empty(size, dtype=np.float32)
+
+            pixels = self._tile_buffer[:size]
+            render_pass.rect.foreach_get(pixels)
+            passes[render_pass.name] = pixels.reshape(height, width, render_pass.channels)[:h, :w].copy()
+
+        return passes
+
+    def _write_tile(self, depsgraph, tile, passes):
+        x, y, w, h = tile
+        result = self.begin_result(x, y, w, h, layer=depsgraph.view_layer.name)
+        try:
+            for render_pass in result.layers[0].passes:
+                pixels = passes.get(render_pass.name)
+                if pixels is not None:
+                    render_pass.rect.foreach_set(pixels.ravel())
+
+        finally:
+            self.end_result(result)
+
+    def _restore_tile(self, depsgraph, checkpoint, index, tile):
+        x, y, w, h = tile
+        result = self.begin_result(x, y, w, h, layer=depsgraph.view_layer.name)
+        try:
+            for render_pass in result.layers[0].passes:
+                try:
+                    pixels = checkpoint.read_tile(index, render_pass.name)
+                except OSError as e:
+                    log.warning("Failed to restore tile %d of pass %s: %s", index, render_pass.name, e)
+                    continue
+
+                render_pass.rect.foreach_set(pixels.ravel())
+
+        finally:
+            self.end_result(result)
+
+    def view_update(self, context, depsgraph):
+        self._idle_throttle.activity()
+        self._resume()
+
+        if self._update_material_hashes(depsgraph):
+            # only unconnected nodes or node layout of materials were changed
+            return
+
+        register_plugins()
+        self._apply_cpu_affinity(context.scene)
+        materialx.wait_stdlib()
+        if not self.engine_ptr:
+            self.reset_render_settings()
+            # render threads are started by delegate, which is created in super().view_update()
+            self._threads_before = get_thread_ids()
+            self._render_threads = None
+            proxies.viewport_started(self)
+            self._shows_proxies = True
+
+        budget = int(context.scene.hydra_rpr.viewport.memory_budget * 2 ** 30 * VIEWPORT_BUDGET_SHARE)
+        texture_cache = use_cached_textures(depsgraph, context.scene.hydra_rpr.texture_cache, 'VIEWPORT',
+                                            budget, not self.engine_ptr)
+        super().view_update(context, depsgraph)
+
+        if texture_cache and texture_cache.hit_rate is not None:
+            log.info("Texture cache hit rate %.0f%%", texture_cache.hit_rate * 100)
+
+    def _update_material_hashes(self, depsgraph):
+        """
+        Updates network hashes of changed materials. Returns True if depsgraph has only updates
+        of materials which networks weren't changed, so delegate doesn't need to translate them again.
+        """
+        updates = depsgraph.updates
+        material_only = len(updates) > 0 and all(isinstance(update.id, bpy.types.Material) for update in updates)
+        is_changed = not material_only
+        for update in updates:
+            if not isinstance(update.id, bpy.types.Material):
+                continue
+
+            material = update.id.original
+            prev_hash = self._material_hashes.get(material.name_full)
+            if prev_hash is None and not material_only:
+                # hashes are calculated lazily for edited materials only
+                continue
+
+            mat_hash = material_hash(material)
+            self._material_hashes[material.name_full] = mat_hash
+            if mat_hash != prev_hash:
+                is_changed = True
+
+        return not is_changed
+
+    def _apply_cpu_affinity(self, scene):
+        """
+        Pins process to CPUs before delegate creates its render threads. Affinity is applied only
+        when it is changed or delegate is created.
+        """
+        global _cpu_affinity
+
+        # affinity is set for the whole process, so it's taken from final settings for all engines
+        settings = scene.hydra_rpr.final
+        if self.engine_ptr and settings.cpu_affinity == _cpu_affinity:
+            return
+
+        _cpu_affinity = settings.cpu_affinity
+        try:
+            set_cpu_affinity(parse_cpu_list(settings.cpu_affinity))
+        except (ValueError, OSError) as e:
+            self.report({'WARNING'}, f"Failed to set CPU affinity '{settings.cpu_affinity}': {e}")
+
+    def view_draw(self, context, depsgraph):
+        super().view_draw(context, depsgraph)
+
+        if self._render_threads is None and self._threads_before is not None and not _final_renders:
+            # delegate starts rendering on the first draw, threads started later belong to Blender jobs or TBB
+            try:
+                self._render_threads = get_thread_ids() - self._threads_before - _final_render_threads
+            except OSError as e:
+                log.warning("Failed to find render threads: %s", e)
+                self._render_threads = set()
+
+        if self._viewport_state.update(context.region_data):
+            self._idle_throttle.activity()
+
+        quality = context.scene.hydra_rpr.viewport.interactive_quality
+        # viewport isn't throttled while final render is running, it has all CPUs anyway
+        if self._idle_throttle.update(quality.enable_idle_throttle and not _final_renders, quality.idle_timeout,
+                                      is_window_focused()):
+            self._set_low_power(self._idle_throttle.is_throttled, quality.idle_cpus)
+
+        if self._idle_throttle.is_throttled:
+            return
+
+        if quality.enable_target_fps:
+            self._governor.update(self._viewport_state, quality.target_fps)
+
+        values, is_refined = self._interactive_quality(quality)
+        if values != self._interactive_values:
+            # new interactive quality values are passed to delegate in view_update()
+            self.tag_update()
+
+        if not is_refined:
+            # keeping viewport redrawing until refinement schedule is finished
+            self.tag_redraw()
+
+    def _set_low_power(self, enable, cpu_count=1):
+        """
+        Pins render threads, which were started by delegate before the first draw, to cpu_count CPUs or restores
+        CPUs of the process. Other threads of Blender aren't affected. Delegate can't pause rendering
+        without losing accumulated samples, so it keeps rendering with fewer CPUs.
+        """
+        try:
+            if enable:
+                cpus = get_cpu_affinity()
+                if not cpus or not self._render_threads:
+                    return
+
+                threads = self._render_threads & get_thread_ids()
+                if not threads:
+                    return
+
+                set_thread_affinity(threads, set(sorted(cpus)[:cpu_count]))
+                self._throttled_threads = threads
+                _throttled_engines.add(self)
+                log.info("Viewport is idle, %d render threads are throttled to %d CPUs", len(threads), cpu_count)
+
+            elif self._throttled_threads:
+                set_thread_affinity(self._throttled_threads, get_cpu_affinity())
+                self._throttled_threads = None
+                _throttled_engines.discard(self)
+                log.info("Viewport rendering is resumed")
+
+        except OSError as e:
+            log.warning("Failed to change CPU affinity: %s", e)
+
+    def _resume(self):
+        """ Lifts idle throttle of viewport """
+        if self._idle_throttle.is_throttled:
+            self._idle_throttle.is_throttled = False
+            self._set_low_power(False)
+
     def update_render_passes(self, scene, render_layer):
-        if render_layer.use_pass_z:
-            self.register_pass(scene, render_layer, 'Depth', 1, 'Z', 'VALUE')
-        if render_layer.use_pass_normal:
-            self.register_pass(scene, render_layer, 'Normal', 3, 'XYZ', 'VECTOR')
-        if render_layer.use_pass_position:
-            self.register_pass(scene, render_layer, 'Position', 4, 'XYZA', 'VECTOR')
+        velocity_only = is_velocity_only(scene)
+        for name, channels, chan_id, pass_type, _, prop in PASSES:
+            if is_pass_enabled(render_layer, prop) or (name == 'Vector' and velocity_only):
+                self.register_pass(scene, render_layer, name, channels, chan_id, pass_type)
 
 
-register, unregister = bpy.utils.register_classes_factory((
+register_classes, unregister_classes = bpy.utils.register_classes_factory((
     RPRHydraRenderEngine,
 ))
+
+
+def register():
+    register_classes()
+
+
+def unregister():
+    unregister_classes()
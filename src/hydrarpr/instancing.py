@@ -0,0 +1,170 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+from collections import defaultdict
+
+import bpy
+
+from .utils import format_memory, log
+
+
+# originals of instanced objects are kept in this collection, which is excluded from view layers
+ORIGINALS_COLLECTION = "RPR Instanced Originals"
+
+
+def mesh_memory(mesh):
+    """ Estimated size of mesh in RPR scene: points, normals, uvs, indices and face counts """
+    loops = len(mesh.loops)
+    return len(mesh.vertices) * 12 + loops * (12 + 4 + 8 * len(mesh.uv_layers)) + len(mesh.polygons) * 4
+
+
+def _material_key(obj):
+    return tuple(slot.material.name_full if slot.material else "" for slot in obj.material_slots)
+
+
+def _is_plain_duplicate(obj, users):
+    """
+    Object can be replaced by instance without losing anything which affects rendering: it has no
+    modifiers, constraints, drivers or custom properties, and only collections and children refer to it
+    """
+    if obj.type != 'MESH' or obj.instance_type != 'NONE' or obj.modifiers or obj.constraints \
+            or obj.parent_type != 'OBJECT':
+        return False
+
+    # properties registered by addons are stored as ID properties too
+    if any(key not in obj.bl_rna.properties for key in obj.keys()):
+        return False
+
+    if obj.animation_data and obj.animation_data.drivers:
+        return False
+
+    return all(isinstance(user, (bpy.types.Collection, bpy.types.Scene))
+               or (isinstance(user, bpy.types.Object) and user.parent == obj) for user in users)
+
+
+def find_duplicates(objects):
+    """
+    Groups mesh objects which share mesh datablock and have the same materials and object render
+    properties. Returns list of object lists with at least 2 objects.
+    """
+    objects = [obj for obj in objects if obj.type == 'MESH']
+    user_map = bpy.data.user_map(subset=objects)
+
+    groups = defaultdict(list)
+    for obj in objects:
+        if _is_plain_duplicate(obj, user_map[obj]):
+            groups[(obj.data.name_full, _material_key(obj), obj.pass_index, tuple(obj.color))].append(obj)
+
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def duplicates_memory(groups):
+    """ Estimated memory which is saved by instancing of duplicates groups """
+    return sum(mesh_memory(group[0].data) * (len(group) - 1) for group in groups)
+
+
+class RPR_HYDRA_OT_instance_duplicates(bpy.types.Operator):
+    """
+    Replaces mesh objects with the same mesh and materials by instances of a shared collection,
+    delegate keeps one mesh with per instance transforms. Only objects without modifiers, constraints,
+    drivers and custom properties are replaced, originals are moved to an excluded collection
+    """
+    bl_idname = "hydra_rpr.instance_duplicates"
+    bl_label = "Instance Duplicates"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    selected_only: bpy.props.BoolProperty(
+        name="Selected Only",
+        description="Process only selected objects",
+        default=False,
+    )
+
+    def execute(self, context):
+        objects = context.selected_objects if self.selected_only else context.scene.objects
+        groups = find_duplicates(objects)
+        if not groups:
+            self.report({'INFO'}, "No duplicate meshes found")
+            return {'CANCELLED'}
+
+        saved_memory = duplicates_memory(groups)
+        originals = self._originals_collection(context.scene)
+
+        count = 0
+        for group in groups:
+            source = group[0]
+            proto_obj = bpy.data.objects.new(f"{source.name}_proto", source.data)
+            proto_obj.pass_index = source.pass_index
+            proto_obj.color = source.color
+            for slot, proto_slot in zip(source.material_slots, proto_obj.material_slots):
+                proto_slot.link = slot.link
+                proto_slot.material = slot.material
+
+            # collection isn't linked to scene, it is rendered only by instances
+            collection = bpy.data.collections.new(f"{source.name}_instances")
+            collection.objects.link(proto_obj)
+
+            for obj in group:
+                self._replace_with_instance(obj, collection, originals)
+
+            count += len(group)
+
+        log.info("Instanced %d objects in %d collections", count, len(groups))
+        self.report({'INFO'}, f"Instanced {count} objects in {len(groups)} collections, "
+                              f"saved about {format_memory(saved_memory)}. "
+                              f"Originals are kept in '{originals.name}' collection")
+        return {'FINISHED'}
+
+    @staticmethod
+    def _originals_collection(scene):
+        collection = scene.collection.children.get(ORIGINALS_COLLECTION)
+        if not collection:
+            collection = bpy.data.collections.new(ORIGINALS_COLLECTION)
+            scene.collection.children.link(collection)
+
+        for view_layer in scene.view_layers:
+            view_layer.layer_collection.children[collection.name].exclude = True
+
+        return collection
+
+    @staticmethod
+    def _replace_with_instance(obj, collection, originals):
+        name = obj.name
+        obj.name = f"{name}_original"
+
+        empty = bpy.data.objects.new(name, None)
+        empty.instance_type = 'COLLECTION'
+        empty.instance_collection = collection
+        empty.parent = obj.parent
+        empty.matrix_parent_inverse = obj.matrix_parent_inverse
+        empty.matrix_basis = obj.matrix_basis
+        empty.hide_render = obj.hide_render
+        empty.hide_viewport = obj.hide_viewport
+        if obj.animation_data and obj.animation_data.action:
+            empty.animation_data_create().action = obj.animation_data.action
+
+        for users_collection in obj.users_collection:
+            users_collection.objects.link(empty)
+            users_collection.objects.unlink(obj)
+
+        originals.objects.link(obj)
+
+        for child in obj.children:
+            matrix = child.matrix_world.copy()
+            child.parent = empty
+            child.matrix_world = matrix
+
+
+register, unregister = bpy.utils.register_classes_factory((
+    RPR_HYDRA_OT_instance_duplicates,
+))
@@ -0,0 +1,130 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import hashlib
+import os
+
+import bpy
+
+
+# properties which don't affect rendering, nested structures skip only their type
+_NESTED_SKIP_PROPS = {'rna_type'}
+_ID_SKIP_PROPS = {
+    *(prop.identifier for prop in bpy.types.ID.bl_rna.properties),
+    'preview', 'preview_render_type', 'paint_active_slot', 'texture_paint_images', 'texture_paint_slots',
+}
+_NODE_SKIP_PROPS = {prop.identifier for prop in bpy.types.Node.bl_rna.properties}
+
+# maximal depth of nested structures like color ramp elements or curve points
+_MAX_DEPTH = 4
+
+
+def _image_key(image):
+    """ Image is identified by its file state too, so changes of the file on disk change the hash """
+    key = f"{image.name_full}|{image.filepath}|{image.source}"
+    if image.packed_file:
+        return f"{key}|{image.packed_file.size}"
+
+    if image.source == 'GENERATED':
+        return f"{key}|{image.generated_type}|{image.generated_width}|{image.generated_height}|" \
+               f"{tuple(image.generated_color)}"
+
+    try:
+        stat = os.stat(bpy.path.abspath(image.filepath, library=image.library))
+        return f"{key}|{stat.st_size}|{stat.st_mtime_ns}"
+    except OSError:
+        return key
+
+
+def _hash_value(sha, val):
+    sha.update(repr(tuple(val) if hasattr(val, '__len__') and not isinstance(val, str) else val).encode())
+
+
+def _hash_rna(sha, struct, skip_props=_NESTED_SKIP_PROPS, depth=0):
+    for prop in struct.bl_rna.properties:
+        if prop.identifier in skip_props:
+            continue
+
+        val = getattr(struct, prop.identifier)
+        if prop.type == 'POINTER':
+            if val is None:
+                sha.update(b"None")
+            elif isinstance(val, bpy.types.Image):
+                sha.update(_image_key(val).encode())
+            elif isinstance(val, bpy.types.ID):
+                sha.update(val.name_full.encode())
+            elif depth < _MAX_DEPTH:
+                _hash_rna(sha, val, depth=depth + 1)
+
+        elif prop.type == 'COLLECTION':
+            if depth < _MAX_DEPTH:
+                for item in val:
+                    _hash_rna(sha, item, depth=depth + 1)
+
+        elif getattr(prop, 'is_array', False):
+            sha.update(repr(tuple(val)).encode())
+
+        else:
+            sha.update(repr(val).encode())
+
+
+def _hash_node(sha, node, visited):
+    """ Hashes node with all its upstream nodes """
+    if node.as_pointer() in visited:
+        return
+
+    visited.add(node.as_pointer())
+    sha.update(f"{node.bl_idname}|{node.mute}".encode())
+    _hash_rna(sha, node, _NODE_SKIP_PROPS)
+
+    for socket in node.inputs:
+        if not socket.enabled:
+            continue
+
+        sha.update(socket.identifier.encode())
+        links = [link for link in socket.links if not link.is_muted]
+        if links:
+            from_node = links[0].from_node
+            sha.update(f"{from_node.name}|{links[0].from_socket.identifier}".encode())
+            _hash_node(sha, from_node, visited)
+        elif hasattr(socket, 'default_value'):
+            _hash_value(sha, socket.default_value)
+
+    if not node.inputs:
+        # value of input nodes like RGB and Value is kept in their output sockets
+        for socket in node.outputs:
+            if socket.enabled and hasattr(socket, 'default_value'):
+                sha.update(socket.identifier.encode())
+                _hash_value(sha, socket.default_value)
+
+    if node.bl_idname == 'ShaderNodeGroup' and node.node_tree:
+        for group_node in node.node_tree.nodes:
+            if group_node.bl_idname == 'NodeGroupOutput' and group_node.is_active_output:
+                _hash_node(sha, group_node, visited)
+
+
+def material_hash(material):
+    """
+    Returns hash of material, world or light network, which includes only nodes connected to output.
+    Changes of unconnected nodes, node names, locations and selection don't change hash.
+    """
+    sha = hashlib.sha1()
+    _hash_rna(sha, material, _ID_SKIP_PROPS)
+
+    if material.use_nodes and material.node_tree:
+        output = material.node_tree.get_output_node('ALL')
+        if output:
+            _hash_node(sha, output, set())
+
+    return sha.hexdigest()
@@ -0,0 +1,62 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import threading
+import time
+
+from .utils import log
+
+
+_stdlib_thread = None
+# time of MaterialX standard library loading in seconds, None until it is loaded
+stdlib_load_time = None
+
+
+def _load_stdlib():
+    global stdlib_load_time
+
+    start_time = time.perf_counter()
+    try:
+        from pxr import Sdr
+
+        # MaterialX discovery plugin of Sdr registry loads standard library with UsdMtlxGetDocument(""),
+        # RprUsdMaterialRegistry gets the same document from UsdMtlx cache
+        Sdr.Registry().GetShaderNodeByIdentifier("ND_standard_surface_surfaceshader")
+
+    except Exception as e:
+        log.error("Failed to load MaterialX standard library: %s", e)
+        return
+
+    stdlib_load_time = time.perf_counter() - start_time
+    log.info("MaterialX standard library loaded in %.3fs", stdlib_load_time)
+
+
+def load_stdlib_async():
+    """ Starts loading MaterialX standard library in background thread, once per process """
+    global _stdlib_thread
+
+    if _stdlib_thread:
+        return
+
+    _stdlib_thread = threading.Thread(target=_load_stdlib, name="HydraRPR MaterialX", daemon=True)
+    _stdlib_thread.start()
+
+
+def wait_stdlib():
+    """ Waits until MaterialX standard library is loaded, returns waiting time in seconds """
+    load_stdlib_async()
+
+    start_time = time.perf_counter()
+    _stdlib_thread.join()
+    return time.perf_counter() - start_time
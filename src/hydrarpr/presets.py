@@ -0,0 +1,270 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import json
+import tempfile
+from pathlib import Path
+
+import bpy
+
+from .utils import log
+
+
+# presets ordered from the cheapest to the most expensive one
+PRESET_ITEMS = (
+    ('DRAFT', "Draft", "Fast noisy render for blocking and layout"),
+    ('PREVIEW', "Preview", "Balanced quality for previews and dailies"),
+    ('LOOKDEV', "Lookdev", "Clean render for look development"),
+    ('FINAL', "Final", "Production quality render"),
+)
+
+FINAL_PRESETS = {
+    'DRAFT': {
+        'max_samples': 16,
+        'min_adaptive_samples': 8,
+        'variance_threshold': 0.1,
+        'quality.max_ray_depth': 2,
+        'quality.max_ray_depth_diffuse': 1,
+        'quality.max_ray_depth_glossy': 1,
+        'quality.max_ray_depth_refraction': 1,
+        'quality.max_ray_depth_glossy_refraction': 1,
+        'quality.max_ray_depth_shadow': 1,
+        'denoise.enable': True,
+        'denoise.schedule': 'FINAL',
+    },
+    'PREVIEW': {
+        'max_samples': 64,
+        'min_adaptive_samples': 16,
+        'variance_threshold': 0.05,
+        'quality.max_ray_depth': 4,
+        'quality.max_ray_depth_diffuse': 2,
+        'quality.max_ray_depth_glossy': 2,
+        'quality.max_ray_depth_refraction': 2,
+        'quality.max_ray_depth_glossy_refraction': 2,
+        'quality.max_ray_depth_shadow': 2,
+        'denoise.enable': True,
+        'denoise.schedule': 'FINAL',
+    },
+    'LOOKDEV': {
+        'max_samples': 256,
+        'min_adaptive_samples': 64,
+        'variance_threshold': 0.02,
+        'quality.max_ray_depth': 8,
+        'quality.max_ray_depth_diffuse': 3,
+        'quality.max_ray_depth_glossy': 3,
+        'quality.max_ray_depth_refraction': 3,
+        'quality.max_ray_depth_glossy_refraction': 3,
+        'quality.max_ray_depth_shadow': 2,
+        'denoise.enable': True,
+        'denoise.schedule': 'LOG',
+    },
+    'FINAL': {
+        'max_samples': 1024,
+        'min_adaptive_samples': 128,
+        'variance_threshold': 0.01,
+        'quality.max_ray_depth': 12,
+        'quality.max_ray_depth_diffuse': 5,
+        'quality.max_ray_depth_glossy': 5,
+        'quality.max_ray_depth_refraction': 6,
+        'quality.max_ray_depth_glossy_refraction': 5,
+        'quality.max_ray_depth_shadow': 4,
+        'denoise.enable': False,
+    },
+}
+
+VIEWPORT_PRESETS = {
+    'DRAFT': {
+        'max_samples': 16,
+        'variance_threshold': 0.1,
+        'interactive_quality.max_ray_depth': 1,
+        'interactive_quality.enable_downscale': True,
+        'interactive_quality.resolution_downscale': 4,
+    },
+    'PREVIEW': {
+        'max_samples': 64,
+        'variance_threshold': 0.05,
+        'interactive_quality.max_ray_depth': 2,
+        'interactive_quality.enable_downscale': True,
+        'interactive_quality.resolution_downscale': 3,
+    },
+    'LOOKDEV': {
+        'max_samples': 256,
+        'variance_threshold': 0.02,
+        'interactive_quality.max_ray_depth': 3,
+        'interactive_quality.enable_downscale': True,
+        'interactive_quality.resolution_downscale': 2,
+    },
+    'FINAL': {
+        'max_samples': 1024,
+        'variance_threshold': 0.01,
+        'interactive_quality.max_ray_depth': 4,
+        'interactive_quality.enable_downscale': True,
+        'interactive_quality.resolution_downscale': 1,
+    },
+}
+
+
+def apply_preset(settings, preset, is_viewport):
+    """ Sets values of preset to RenderSettings """
+    values = (VIEWPORT_PRESETS if is_viewport else FINAL_PRESETS).get(preset)
+    if not values:
+        return
+
+    for path, val in values.items():
+        data, _, prop = path.rpartition('.')
+        setattr(settings.path_resolve(data) if data else settings, prop, val)
+
+
+def update_preset(settings, context):
+    """ Update callback of RenderSettings.preset """
+    apply_preset(settings, settings.preset, settings.path_from_id().endswith('viewport'))
+
+
+def _snapshot(struct):
+    """ Returns values of all properties of property group including nested groups """
+    values = {}
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == 'rna_type' or prop.type == 'COLLECTION':
+            continue
+
+        val = getattr(struct, prop.identifier)
+        if isinstance(val, bpy.types.PropertyGroup):
+            values[prop.identifier] = _snapshot(val)
+        elif not prop.is_readonly:
+            values[prop.identifier] = tuple(val) if getattr(prop, 'is_array', False) else val
+
+    return values
+
+
+def _restore(struct, values):
+    # preset is restored first, as its update callback overwrites other values
+    for key in sorted(values, key=lambda key: key != 'preset'):
+        val = values[key]
+        if isinstance(val, dict):
+            _restore(getattr(struct, key), val)
+        else:
+            setattr(struct, key, val)
+
+
+class RPR_HYDRA_OT_calibrate_preset(bpy.types.Operator):
+    """
+    Renders short probes of the current scene with every preset at reduced resolution and
+    selects the cheapest final preset which meets noise and time targets
+    """
+    bl_idname = "hydra_rpr.calibrate_preset"
+    bl_label = "Calibrate Preset"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    noise_target: bpy.props.FloatProperty(
+        name="Noise Target",
+        description="Maximal allowed noise level, mean of Variance pass of probe render",
+        min=0.0001, max=1.0,
+        default=0.05,
+    )
+    time_target: bpy.props.FloatProperty(
+        name="Time Target",
+        description="Maximal allowed render time of full resolution frame",
+        subtype='TIME_ABSOLUTE',
+        min=0.1, max=24 * 3600.0,
+        default=60.0,
+    )
+    probe_percentage: bpy.props.IntProperty(
+        name="Probe Resolution",
+        description="Resolution of probe renders relative to the final resolution",
+        subtype='PERCENTAGE',
+        min=5, max=100,
+        default=25,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.camera is not None
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        scene = context.scene
+        render = scene.render
+        settings = scene.hydra_rpr.final
+        view_layer = context.view_layer
+
+        prev_settings = _snapshot(settings)
+        prev_percentage = render.resolution_percentage
+        prev_log = scene.hydra_rpr.telemetry_log
+        prev_variance = view_layer.hydra_rpr.use_pass_variance
+
+        # render time and noise are taken from telemetry of probe render
+        telemetry_path = Path(tempfile.mkdtemp(prefix="hydrarpr_calibrate_")) / "telemetry.jsonl"
+        scene.hydra_rpr.telemetry_log = str(telemetry_path)
+        view_layer.hydra_rpr.use_pass_variance = True
+        render.resolution_percentage = max(prev_percentage * self.probe_percentage // 100, 1)
+        scale = (prev_percentage / render.resolution_percentage) ** 2
+
+        # presets which fit time target: (preset, name, estimated full resolution render time, noise)
+        fitting = []
+        try:
+            for preset, name, _ in PRESET_ITEMS:
+                settings.preset = preset
+                lines_count = len(_read_lines(telemetry_path))
+                bpy.ops.render.render()
+
+                lines = _read_lines(telemetry_path)
+                if len(lines) == lines_count:
+                    self.report({'ERROR'}, f"Probe render of preset '{name}' failed or was cancelled")
+                    _restore(settings, prev_settings)
+                    return {'CANCELLED'}
+
+                telemetry = json.loads(lines[-1])
+                est_time = telemetry['sync_time'] + telemetry['render_time'] * scale
+                noise = telemetry['mean_variance']
+                log.info("Preset %s: estimated render time %.1fs, noise %s", name, est_time, noise)
+                if est_time > self.time_target:
+                    # more expensive presets won't fit too
+                    break
+
+                fitting.append((preset, name, est_time, noise))
+                if noise is not None and noise <= self.noise_target:
+                    # more expensive presets aren't needed
+                    break
+
+        finally:
+            render.resolution_percentage = prev_percentage
+            scene.hydra_rpr.telemetry_log = prev_log
+            view_layer.hydra_rpr.use_pass_variance = prev_variance
+
+        if not fitting:
+            settings.preset = PRESET_ITEMS[0][0]
+            self.report({'WARNING'}, f"No preset fits time target {self.time_target:.1f}s, "
+                                     f"'{PRESET_ITEMS[0][1]}' is selected")
+            return {'FINISHED'}
+
+        preset, name, est_time, noise = fitting[-1]
+        settings.preset = preset
+        if noise is not None and noise <= self.noise_target:
+            self.report({'INFO'}, f"'{name}' is selected, estimated render time {est_time:.1f}s, "
+                                  f"noise {noise:.4f}")
+        else:
+            self.report({'WARNING'}, f"No preset meets noise target within time target, '{name}' is "
+                                     f"selected, estimated render time {est_time:.1f}s")
+        return {'FINISHED'}
+
+
+def _read_lines(path):
+    return path.read_text(encoding='utf-8').splitlines() if path.is_file() else []
+
+
+register, unregister = bpy.utils.register_classes_factory((
+    RPR_HYDRA_OT_calibrate_preset,
+))
@@ -0,0 +1,113 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+import bpy
+
+from .materials import material_hash
+from .utils import log
+
+
+# the oldest previews are removed when cache has more files
+MAX_PREVIEWS = 2000
+
+
+def preview_settings(settings, preview):
+    """ Render settings of material preview: final device and render quality with preview profile """
+    max_samples = preview.max_samples
+    return {
+        'rpr:renderDevice': settings.device,
+        'rpr:cpuThreadCount': settings.cpu_threads,
+
+        'rpr:alpha:enable': settings.enable_alpha,
+        'rpr:core:renderQuality': settings.render_quality,
+        'rpr:core:renderMode': settings.render_mode,
+        'rpr:maxSamples': max_samples,
+        'rpr:adaptiveSampling:minSamples': max_samples,
+        'rpr:adaptiveSampling:noiseTreshold': 0.0,
+
+        # denoising only the final image
+        'rpr:denoising:enable': preview.enable_denoise,
+        'rpr:denoising:minIter': max_samples,
+        'rpr:denoising:iterStep': max_samples,
+
+        'rpr:quality:rayDepth': preview.max_ray_depth,
+        'rpr:quality:rayDepthDiffuse': min(preview.max_ray_depth, 2),
+        'rpr:quality:rayDepthGlossy': min(preview.max_ray_depth, 2),
+        'rpr:quality:rayDepthRefraction': preview.max_ray_depth,
+        'rpr:quality:rayDepthGlossyRefraction': preview.max_ray_depth,
+        'rpr:quality:rayDepthShadow': min(preview.max_ray_depth, 2),
+
+        'aovToken:Combined': "color",
+    }
+
+
+def _object_key(obj):
+    return [obj.name_full, obj.data.name_full if obj.data else None, [tuple(row) for row in obj.matrix_world],
+            [slot.material.name_full if slot.material else None for slot in obj.material_slots]]
+
+
+def _mesh_key(mesh):
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    return [mesh.name_full, len(mesh.polygons), hashlib.sha1(co.tobytes()).hexdigest()]
+
+
+def preview_path(depsgraph, preview, render_settings):
+    """
+    Path of cached preview, keyed by hashes of previewed materials, worlds and lights, preview objects
+    with their meshes, resolution and render settings
+    """
+    render = depsgraph.scene.render
+    sha = hashlib.sha1()
+    sha.update(json.dumps({
+        'materials': sorted(material_hash(id) for id in depsgraph.ids
+                            if isinstance(id, (bpy.types.Material, bpy.types.World, bpy.types.Light))),
+        'objects': sorted(_object_key(obj) for obj in depsgraph.objects),
+        'meshes': sorted(_mesh_key(id) for id in depsgraph.ids if isinstance(id, bpy.types.Mesh)),
+        'resolution': [render.resolution_x, render.resolution_y, render.resolution_percentage],
+        'settings': render_settings,
+    }, sort_keys=True, default=str).encode())
+
+    return Path(bpy.path.abspath(preview.cache_dir)) / f"{sha.hexdigest()}.npy"
+
+
+def load_preview(path, size):
+    """ Returns pixels of cached preview or None """
+    try:
+        pixels = np.load(path)
+    except (OSError, ValueError):
+        return None
+
+    return pixels if pixels.size == size else None
+
+
+def save_preview(path, pixels):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, pixels)
+
+        files = list(path.parent.glob("*.npy"))
+        if len(files) > MAX_PREVIEWS:
+            files.sort(key=lambda f: f.stat().st_mtime)
+            for f in files[:len(files) - MAX_PREVIEWS]:
+                f.unlink(missing_ok=True)
+
+    except OSError as e:
+        log.error("Failed to write preview %s: %s", path, e)
@@ -13,6 +13,8 @@
 # limitations under the License.
 # ********************************************************************
 import math
+import tempfile
+from pathlib import Path
 
 import bpy
 from bpy.props import (
@@ -21,8 +23,12 @@ from bpy.props import (
     FloatProperty,
     BoolProperty,
     IntProperty,
+    StringProperty,
 )
 
+from .presets import PRESET_ITEMS, update_preset
+from .proxies import update_proxy_settings
+
 
 class Properties(bpy.types.PropertyGroup):
     bl_type = None
@@ -131,6 +137,76 @@ class InteractiveQualitySettings(bpy.types.PropertyGroup):
         min=0, max=10,
         default=3,
     )
+    enable_target_fps: BoolProperty(
+        name="Target FPS",
+        description="Automatically lower ray depth and increase resolution downscale during\n"
+                    "viewport navigation to keep target frame rate. Full quality is restored\n"
+                    "when camera is idle",
+        default=False,
+    )
+    target_fps: IntProperty(
+        name="FPS",
+        description="Frame rate which should be kept during viewport navigation",
+        min=1, max=120,
+        default=15,
+    )
+    enable_progressive_refinement: BoolProperty(
+        name="Progressive Refinement",
+        description="Render with 'Navigation Downscale' and ray depth 1 during viewport navigation,\n"
+                    "then step resolution and ray depth up to the quality values when camera stops",
+        default=False,
+    )
+    navigation_downscale: IntProperty(
+        name="Navigation Downscale",
+        description="Resolution downscale during viewport navigation.\n"
+                    "Formula: resolution / (2 ^ downscale)",
+        min=0, max=10,
+        default=5,
+    )
+    refinement_time: FloatProperty(
+        name="Refinement Time",
+        description="Time after camera stops during which resolution and ray depth are stepped up\n"
+                    "to the quality values",
+        subtype='TIME_ABSOLUTE',
+        min=0.0, max=10.0,
+        default=1.0,
+    )
+    enable_idle_throttle: BoolProperty(
+        name="Throttle When Idle",
+        description="Limit viewport rendering to 'Idle CPUs' when there is no interaction with viewport\n"
+                    "for 'Idle Timeout' or Blender window isn't in foreground (Windows only).\n"
+                    "Only render threads of viewport are limited. All CPUs are restored on viewport navigation,\n"
+                    "scene change or when final render starts",
+        default=False,
+    )
+    idle_timeout: FloatProperty(
+        name="Idle Timeout",
+        description="Time without viewport interaction after which rendering is throttled",
+        subtype='TIME_ABSOLUTE',
+        min=1.0, max=3600.0,
+        default=30.0,
+    )
+    idle_cpus: IntProperty(
+        name="Idle CPUs",
+        description="Number of CPUs used by viewport render threads while viewport is throttled",
+        min=1, max=256,
+        default=1,
+    )
+    enable_proxies: BoolProperty(
+        name="Viewport Proxies",
+        description="Replace heavy meshes in viewport by decimated or user defined proxies to fit\n"
+                    "triangle budget. Final render uses full resolution geometry. While viewport is rendered,\n"
+                    "Solid viewports and exporters which apply modifiers get proxies too",
+        default=False,
+        update=update_proxy_settings,
+    )
+    triangle_budget: FloatProperty(
+        name="Triangle Budget",
+        description="Maximal number of viewport triangles in millions",
+        min=0.01, max=1000.0,
+        default=5.0,
+        update=update_proxy_settings,
+    )
 
 
 class ContourSettings(bpy.types.PropertyGroup):
@@ -213,9 +289,28 @@ class DenoiseSettings(bpy.types.PropertyGroup):
         min=1, max=2 ** 16,
         default=32,
     )
+    schedule: EnumProperty(
+        name="Schedule",
+        description="When denoising is applied during rendering",
+        items=(
+            ('FIXED', "Fixed", "Denoise every 'Iteration Step' iterations after 'Min Iteration'"),
+            ('LOG', "Logarithmic", "Denoise log2(Max Samples / Min Iteration) + 1 times at even steps, "
+                                   "the last time on the last sample. Number of passes grows slowly "
+                                   "with samples, so less time is spent on denoising of high sample renders"),
+            ('FINAL', "Final Only", "Denoise only the last iteration, recommended for batch renders"),
+        ),
+        default='FIXED',
+    )
 
 
 class RenderSettings(bpy.types.PropertyGroup):
+    preset: EnumProperty(
+        name="Preset",
+        description="Performance preset, sets samples, ray depths, noise threshold and downscale",
+        items=(('CUSTOM', "Custom", "Settings are set manually"), *PRESET_ITEMS),
+        default='CUSTOM',
+        update=update_preset,
+    )
     device: EnumProperty(
         name="Render Device",
         description="Render Device",
@@ -223,6 +318,18 @@ class RenderSettings(bpy.types.PropertyGroup):
                ('CPU', "CPU", "Legacy render device")),
         default='GPU',
     )
+    cpu_threads: IntProperty(
+        name="CPU Threads",
+        description="Number of CPU render threads. Set to 0 to use all available threads",
+        min=0, max=1024,
+        default=0,
+    )
+    cpu_affinity: StringProperty(
+        name="CPU Affinity",
+        description="CPUs which Blender process is pinned to, for example: 0-7,16-23.\n"
+                    "Allows to pack several renders on one machine. Leave empty to use all CPUs",
+        default="",
+    )
     render_quality: EnumProperty(
         name="Render Quality",
         description="Render Quality",
@@ -275,6 +382,44 @@ class RenderSettings(bpy.types.PropertyGroup):
         min=0.0, max=1.0,
         default=0.05,
     )
+    time_limit: FloatProperty(
+        name="Time Limit",
+        description="Time budget for final render of a frame, including scene sync. Samples count\n"
+                    "is limited by sample rate measured on a previous render with the same resolution\n"
+                    "and settings on this machine. Rate is measured only by renders without adaptive\n"
+                    "sampling. Set to 0 for no limit",
+        subtype='TIME_ABSOLUTE',
+        min=0.0, max=24 * 3600.0,
+        default=0.0,
+    )
+    memory_budget: FloatProperty(
+        name="Memory Budget",
+        description="Memory in GB available for textures, larger textures are downscaled to fit it.\n"
+                    "Viewport uses half of its budget to leave memory for interactive updates.\n"
+                    "Set to 0 for no limit",
+        min=0.0, max=1024.0,
+        default=0.0,
+    )
+    enable_checkpoints: BoolProperty(
+        name="Checkpoints",
+        description="Write finished tiles of final render to disk, interrupted render of the same frame\n"
+                    "with the same settings resumes from not finished tiles. Enables tiled rendering",
+        default=False,
+    )
+    checkpoint_dir: StringProperty(
+        name="Checkpoint Directory",
+        description="Directory for checkpoints, a subdirectory is created for every scene and frame",
+        subtype='DIR_PATH',
+        default="//checkpoints/",
+    )
+    checkpoint_interval: FloatProperty(
+        name="Checkpoint Interval",
+        description="Minimal time between checkpoint writes, finished tiles are kept in memory until "
+                    "the next write",
+        subtype='TIME_ABSOLUTE',
+        min=0.0, max=24 * 3600.0,
+        default=60.0,
+    )
     enable_alpha: BoolProperty(
         name="Enable Color Alpha",
         description="World background is transparent, for compositing the render over another background",
@@ -285,6 +430,22 @@ class RenderSettings(bpy.types.PropertyGroup):
         description="If disabled, only velocity AOV will store information about movement on the scene.\n"
                     "Required for motion blur that is generated in post-processing",
         default=True,
+        # velocity pass is registered automatically if beauty motion blur is disabled
+        update=lambda self, context: context.view_layer.update_render_passes(),
+    )
+    enable_tiles: BoolProperty(
+        name="Tiled Rendering",
+        description="Render final frame by tiles one after another to limit memory used by render passes.\n"
+                    "Recommended for very large resolutions",
+        default=False,
+    )
+    tile_size: IntProperty(
+        name="Tile Size",
+        description="Size of square tile in pixels.\n"
+                    "If only checkpoints are enabled, tile is decreased to split frame at least into 2x2 tiles",
+        subtype='PIXEL',
+        min=64, max=16384,
+        default=2048,
     )
 
     quality: PointerProperty(type=QualitySettings)
@@ -294,11 +455,119 @@ class RenderSettings(bpy.types.PropertyGroup):
     denoise: PointerProperty(type=DenoiseSettings)
 
 
+class TextureCacheSettings(bpy.types.PropertyGroup):
+    enable: BoolProperty(
+        name="Texture Cache",
+        description="Convert image textures once to tiled mip-mapped files and render with them.\n"
+                    "Converted textures are shared between renders, sessions and blend files",
+        default=False,
+    )
+    directory: StringProperty(
+        name="Directory",
+        description="Directory of converted textures",
+        subtype='DIR_PATH',
+        default=str(Path(tempfile.gettempdir()) / "hydrarpr_texture_cache"),
+    )
+    max_size: FloatProperty(
+        name="Max Size",
+        description="Maximal size of texture cache on disk in GB, least recently used textures are removed",
+        min=0.1, max=10000.0,
+        default=20.0,
+    )
+    compression: EnumProperty(
+        name="Compression",
+        description="Compression of converted textures",
+        items=(
+            ('NONE', "None", "Uncompressed textures, the fastest to load"),
+            ('ZIP', "Zip", "Lossless compression, smaller files with slower loading"),
+        ),
+        default='ZIP',
+    )
+
+
+class PreviewSettings(bpy.types.PropertyGroup):
+    max_samples: IntProperty(
+        name="Max Samples",
+        description="Number of samples of material preview",
+        min=1, max=1024,
+        default=16,
+    )
+    max_ray_depth: IntProperty(
+        name="Max Ray Depth",
+        description="Number of ray bounces of material preview",
+        min=1, max=50,
+        default=3,
+    )
+    enable_denoise: BoolProperty(
+        name="Denoise",
+        description="Denoise material preview after the last sample",
+        default=False,
+    )
+    enable_cache: BoolProperty(
+        name="Cache Previews",
+        description="Store rendered previews on disk and reuse them for materials with unchanged network",
+        default=True,
+    )
+    cache_dir: StringProperty(
+        name="Cache Directory",
+        description="Directory of cached previews",
+        subtype='DIR_PATH',
+        default=str(Path(tempfile.gettempdir()) / "hydrarpr_preview_cache"),
+    )
+
+
 class SceneProperties(Properties):
     bl_type = bpy.types.Scene
 
     final: bpy.props.PointerProperty(type=RenderSettings)
     viewport: bpy.props.PointerProperty(type=RenderSettings)
+    texture_cache: bpy.props.PointerProperty(type=TextureCacheSettings)
+    preview: bpy.props.PointerProperty(type=PreviewSettings)
+
+    telemetry_log: bpy.props.StringProperty(
+        name="Telemetry Log",
+        description="Path to JSON-lines file where performance data of every final render frame\n"
+                    "is appended: sync and render times, max samples per second, peak memory.\n"
+                    "Leave empty to disable",
+        subtype='FILE_PATH',
+        default="",
+    )
+
+
+class ObjectProperties(Properties):
+    bl_type = bpy.types.Object
+
+    viewport_proxy: PointerProperty(
+        type=bpy.types.Object,
+        name="Viewport Proxy",
+        description="Object which geometry replaces this object in viewport when 'Viewport Proxies'\n"
+                    "are enabled. Final render uses geometry of this object",
+        poll=lambda self, obj: obj.type == 'MESH' and obj != self.id_data,
+        update=update_proxy_settings,
+    )
+
+
+class ViewLayerProperties(Properties):
+    bl_type = bpy.types.ViewLayer
+
+    use_pass_variance: BoolProperty(
+        name="Variance",
+        description="Deliver per pixel variance of rendered samples",
+        default=False,
+        update=lambda self, context: context.view_layer.update_render_passes(),
+    )
+    use_pass_prim_id: BoolProperty(
+        name="Prim ID",
+        description="Deliver internal id of rendered prim per pixel. It isn't object pass index",
+        default=False,
+        update=lambda self, context: context.view_layer.update_render_passes(),
+    )
+    use_pass_material_id: BoolProperty(
+        name="Material ID",
+        description="Deliver internal id of rendered material per pixel. It isn't material pass index",
+        default=False,
+        update=lambda self, context: context.view_layer.update_render_passes(),
+    )
 
 
 register, unregister = bpy.utils.register_classes_factory((
@@ -307,5 +576,9 @@ register, unregister = bpy.utils.register_classes_factory((
     InteractiveQualitySettings,
     QualitySettings,
     RenderSettings,
+    TextureCacheSettings,
+    PreviewSettings,
     SceneProperties,
+    ObjectProperties,
+    ViewLayerProperties,
 ))
@@ -0,0 +1,257 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+"""
+Viewport proxies are modifiers which are enabled only in viewport: Decimate modifier for heavy meshes
+or geometry nodes modifier which replaces geometry with user defined proxy object.
+Final render evaluates objects without them, so it always gets full resolution geometry.
+Modifiers are enabled only while Hydra RPR viewport render is running, Blender can't restrict them
+to render engine, so during that time Solid viewports and exporters which apply modifiers
+(OBJ, FBX) get proxy geometry too. Disabled modifiers are kept in scene and saved to .blend file.
+"""
+import weakref
+
+import bpy
+from bpy.app.handlers import persistent
+
+from .utils import log
+
+
+ENGINE_ID = 'RPRHydraRenderEngine'
+
+PROXY_MODIFIER = "RPR Proxy"
+PROXY_NODE_GROUP = "RPR Proxy"
+
+# meshes with fewer triangles are never decimated
+MIN_TRIANGLES = 10000
+MIN_RATIO = 0.01
+# relative change of decimate ratio below which modifiers aren't updated
+RATIO_TOLERANCE = 0.05
+
+# engines with running viewport render, proxy modifiers are enabled while there is any
+_viewport_engines = weakref.WeakSet()
+
+
+def mesh_triangles(mesh):
+    return len(mesh.loops) - 2 * len(mesh.polygons)
+
+
+def _evaluated_triangles(obj, depsgraph):
+    """ Triangles of evaluated object without decimation of its proxy modifier """
+    modifier = obj.modifiers.get(PROXY_MODIFIER)
+    if modifier and modifier.type == 'NODES':
+        # proxy object was just removed, evaluated geometry is still the proxy one
+        return mesh_triangles(obj.data)
+
+    triangles = mesh_triangles(obj.evaluated_get(depsgraph).data)
+    if modifier and modifier.show_viewport:
+        triangles = int(triangles / max(modifier.ratio, MIN_RATIO))
+
+    return triangles
+
+
+def _proxy_node_group():
+    node_group = bpy.data.node_groups.get(PROXY_NODE_GROUP)
+    if node_group:
+        return node_group
+
+    node_group = bpy.data.node_groups.new(PROXY_NODE_GROUP, 'GeometryNodeTree')
+    node_group.interface.new_socket("Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+    node_group.interface.new_socket("Proxy", in_out='INPUT', socket_type='NodeSocketObject')
+    node_group.interface.new_socket("Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+
+    nodes = node_group.nodes
+    group_input = nodes.new('NodeGroupInput')
+    group_output = nodes.new('NodeGroupOutput')
+    object_info = nodes.new('GeometryNodeObjectInfo')
+    object_info.transform_space = 'ORIGINAL'
+    node_group.links.new(group_input.outputs["Proxy"], object_info.inputs["Object"])
+    node_group.links.new(object_info.outputs["Geometry"], group_output.inputs["Geometry"])
+    return node_group
+
+
+def _set_modifier(obj, modifier_type):
+    modifier = obj.modifiers.get(PROXY_MODIFIER)
+    if modifier and modifier.type != modifier_type:
+        obj.modifiers.remove(modifier)
+        modifier = None
+
+    if not modifier:
+        modifier = obj.modifiers.new(PROXY_MODIFIER, modifier_type)
+        modifier.show_viewport = bool(_viewport_engines)
+        modifier.show_render = False
+        modifier.show_in_editmode = False
+
+    return modifier
+
+
+def remove_proxies(objects):
+    for obj in objects:
+        modifier = obj.modifiers.get(PROXY_MODIFIER) if obj.type == 'MESH' else None
+        if modifier:
+            obj.modifiers.remove(modifier)
+
+
+def _proxy_modifiers():
+    for scene in bpy.data.scenes:
+        for obj in scene.objects:
+            modifier = obj.modifiers.get(PROXY_MODIFIER) if obj.type == 'MESH' and not obj.library else None
+            if modifier:
+                yield modifier
+
+
+def _show_proxies(show):
+    for modifier in _proxy_modifiers():
+        if modifier.show_viewport != show:
+            modifier.show_viewport = show
+
+
+def viewport_started(engine):
+    """ Enables proxy modifiers when the first viewport render is started """
+    if not _viewport_engines:
+        _show_proxies(True)
+
+    _viewport_engines.add(engine)
+
+
+def viewport_stopped():
+    """ Disables proxy modifiers after the last viewport render is stopped, called from engine destructor """
+    def disable():
+        if not _viewport_engines:
+            _show_proxies(False)
+
+    # engine is destroyed during Blender data update, modifiers are changed right after it
+    bpy.app.timers.register(disable, first_interval=0.0)
+
+
+def is_enabled(scene):
+    return scene.render.engine == ENGINE_ID and scene.hydra_rpr.viewport.interactive_quality.enable_proxies
+
+
+def update_proxies(scene, depsgraph):
+    """ Sets proxy modifiers of scene mesh objects to fit viewport triangle budget """
+    objects = [obj for obj in scene.objects if obj.type == 'MESH' and not obj.library]
+    if not is_enabled(scene):
+        remove_proxies(objects)
+        return
+
+    budget = scene.hydra_rpr.viewport.interactive_quality.triangle_budget * 10 ** 6
+    auto_objects = []
+    light_objects = []
+    light_triangles = 0
+    heavy_triangles = 0
+    for obj in objects:
+        proxy = obj.hydra_rpr.viewport_proxy
+        if proxy:
+            _set_modifier(obj, 'NODES')
+            modifier = obj.modifiers[PROXY_MODIFIER]
+            modifier.node_group = _proxy_node_group()
+            modifier[modifier.node_group.interface.items_tree["Proxy"].identifier] = proxy
+            if proxy.type == 'MESH':
+                light_triangles += mesh_triangles(proxy.evaluated_get(depsgraph).data)
+            continue
+
+        triangles = _evaluated_triangles(obj, depsgraph)
+        # linked duplicates aren't decimated, modifier would give every object its own mesh
+        if triangles < MIN_TRIANGLES or obj.data.users > 1:
+            light_triangles += triangles
+            light_objects.append(obj)
+        else:
+            heavy_triangles += triangles
+            auto_objects.append(obj)
+
+    remove_proxies(light_objects)
+    if light_triangles + heavy_triangles <= budget:
+        remove_proxies(auto_objects)
+        return
+
+    ratio = max((budget - light_triangles) / heavy_triangles, MIN_RATIO)
+    for obj in auto_objects:
+        modifier = _set_modifier(obj, 'DECIMATE')
+        if abs(modifier.ratio - ratio) > modifier.ratio * RATIO_TOLERANCE:
+            modifier.ratio = ratio
+
+    log.info("Viewport proxies: %d meshes decimated to %.1f%% for budget of %d triangles",
+             len(auto_objects), ratio * 100, budget)
+
+
+def update_proxy_settings(settings, context):
+    """ Update callback of InteractiveQualitySettings proxy properties """
+    update_proxies(context.scene, context.evaluated_depsgraph_get())
+
+
+# scene name -> mesh objects on the last proxies update of scenes with enabled proxies
+_synced_scenes = {}
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    """ Updates proxies when render engine is changed or mesh objects are added or removed """
+    enabled = is_enabled(scene)
+    if not enabled and scene.name_full not in _synced_scenes:
+        return
+
+    state = frozenset(obj.name_full for obj in scene.objects if obj.type == 'MESH') if enabled else None
+    if _synced_scenes.get(scene.name_full) == state:
+        return
+
+    update_proxies(scene, depsgraph)
+    if enabled:
+        _synced_scenes[scene.name_full] = state
+    else:
+        # render engine was changed or proxies were disabled, modifiers are removed
+        del _synced_scenes[scene.name_full]
+
+
+@persistent
+def on_save_pre(*args):
+    """ Proxies are saved disabled, Blender sessions without addon get original objects """
+    if _viewport_engines:
+        _show_proxies(False)
+
+
+@persistent
+def on_save_post(*args):
+    if _viewport_engines:
+        _show_proxies(True)
+
+
+class RPR_HYDRA_OT_update_proxies(bpy.types.Operator):
+    """ Updates viewport proxies of scene meshes to fit triangle budget """
+    bl_idname = "hydra_rpr.update_proxies"
+    bl_label = "Update Proxies"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        update_proxies(context.scene, context.evaluated_depsgraph_get())
+        return {'FINISHED'}
+
+
+register_classes, unregister_classes = bpy.utils.register_classes_factory((
+    RPR_HYDRA_OT_update_proxies,
+))
+
+
+def register():
+    register_classes()
+    bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
+    bpy.app.handlers.save_pre.append(on_save_pre)
+    bpy.app.handlers.save_post.append(on_save_post)
+
+
+def unregister():
+    bpy.app.handlers.save_post.remove(on_save_post)
+    bpy.app.handlers.save_pre.remove(on_save_pre)
+    bpy.app.handlers.depsgraph_update_post.remove(on_depsgraph_update)
+    unregister_classes()
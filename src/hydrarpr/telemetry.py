@@ -0,0 +1,135 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import bpy
+
+from .utils import format_memory, log
+
+
+class FrameTelemetry:
+    """
+    Performance data of a final render frame. Times are in seconds, memory is in bytes,
+    values which delegate doesn't expose are None.
+    """
+
+    def __init__(self, scene, settings):
+        self.start_time = time.perf_counter()
+
+        scale = scene.render.resolution_percentage / 100
+        self.data = {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'addon_version': ".".join(str(v) for v in _addon_version()),
+            'blend_file': bpy.data.filepath,
+            'scene': scene.name,
+            'frame': scene.frame_current,
+            'resolution': [int(scene.render.resolution_x * scale), int(scene.render.resolution_y * scale)],
+            'render_quality': settings.render_quality,
+            'device': settings.device,
+            'max_samples': None,
+            'sync_time': None,
+            'time_to_first_pixel': None,
+            'render_time': None,
+            'total_time': None,
+            'max_samples_per_sec': None,
+            'denoise_passes': None,
+            'denoise_time': None,
+            'mean_variance': None,
+            'peak_memory': None,
+            'peak_device_memory': None,
+            'materialx_load_time': None,
+            'materialx_wait_time': None,
+            'texture_cache_hit_rate': None,
+        }
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, val):
+        self.data[key] = val
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def update_peak_memory(self, peak_memory):
+        if peak_memory is not None:
+            self.data['peak_memory'] = max(self.data['peak_memory'] or 0, peak_memory)
+
+    def stats_line(self):
+        items = [f"Sync {self.data['sync_time']:.2f}s"]
+        if self.data['render_time'] is not None:
+            items.append(f"Render {self.data['render_time']:.2f}s")
+        if self.data['max_samples_per_sec'] is not None:
+            items.append(f"{self.data['max_samples_per_sec']:.1f} max samples/s")
+        items.append(f"Peak Mem {format_memory(self.data['peak_memory'])}")
+        return " | ".join(items)
+
+    def write(self, log_path):
+        """ Appends frame data as a line to JSON-lines log file """
+        path = Path(bpy.path.abspath(log_path))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open('a', encoding='utf-8') as f:
+                f.write(json.dumps(self.data) + "\n")
+
+        except OSError as e:
+            log.error("Failed to write render telemetry to %s: %s", path, e)
+
+
+# pixel samples per second of final renders, shared by all Blender processes on the machine
+SAMPLE_RATES_PATH = Path(tempfile.gettempdir()) / "hydrarpr_sample_rates.json"
+
+
+def sample_rate_key(scene, settings, resolution):
+    """ Sample rate is stored per scene, resolution and settings which affect render speed """
+    return json.dumps([bpy.data.filepath, scene.name, list(resolution), settings.device,
+                       settings.render_quality, settings.render_mode, settings.quality.max_ray_depth,
+                       settings.denoise.enable])
+
+
+def _load_sample_rates():
+    try:
+        return json.loads(SAMPLE_RATES_PATH.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log.warning("Failed to read sample rates %s: %s", SAMPLE_RATES_PATH, e)
+        return {}
+
+
+def load_sample_rate(key):
+    """ Returns pixel samples per second measured on the previous render with the same key or None """
+    return _load_sample_rates().get(key)
+
+
+def save_sample_rate(key, rate):
+    rates = _load_sample_rates()
+    rates[key] = rate
+    try:
+        # file is replaced at once, as it could be read by other render processes
+        tmp_path = SAMPLE_RATES_PATH.with_name(f"{SAMPLE_RATES_PATH.stem}_{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(rates), encoding='utf-8')
+        tmp_path.replace(SAMPLE_RATES_PATH)
+    except OSError as e:
+        log.error("Failed to write sample rates %s: %s", SAMPLE_RATES_PATH, e)
+
+
+def _addon_version():
+    from . import bl_info
+    return bl_info['version']
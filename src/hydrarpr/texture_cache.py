@@ -0,0 +1,313 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import functools
+import hashlib
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import bpy
+
+from .utils import log
+
+
+TEXTURE_EXT = ".tx"
+TILE_SIZE = 64
+MIN_TEXTURE_SIZE = 256
+
+
+class TextureCache:
+    """
+    Persistent cache of image textures converted to tiled mip-mapped format. Cached files are keyed
+    by content hash of source file and evicted by last use time when cache exceeds its size.
+    """
+
+    def __init__(self, directory):
+        self.path = Path(bpy.path.abspath(directory))
+        self.hits = 0
+        self.misses = 0
+
+        # 'sources': "path|size|mtime" -> content hash, 'textures': file name -> {'size', 'used'}
+        self.index = {'sources': {}, 'textures': {}}
+        try:
+            self.index = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            log.warning("Failed to read texture cache index %s: %s", self.index_path, e)
+
+    @property
+    def index_path(self):
+        return self.path / "index.json"
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def get(self, source, compression, max_size=0):
+        """
+        Returns path to cached texture of source file, converts it if needed. Texture which is larger
+        than non zero max_size is downscaled. Returns None if texture couldn't be converted.
+        """
+        try:
+            content_hash = self._content_hash(source)
+        except OSError as e:
+            log.warning("Failed to read texture %s: %s", source, e)
+            return None
+
+        name = f"{content_hash}_{compression.lower()}{f'_{max_size}' if max_size else ''}{TEXTURE_EXT}"
+        path = self.path / name
+        entry = self.index['textures'].get(name)
+        if entry and path.is_file():
+            self.hits += 1
+        else:
+            self.misses += 1
+            if not _make_texture(source, path, compression, max_size):
+                return None
+
+            entry = self.index['textures'][name] = {'size': path.stat().st_size}
+
+        entry['used'] = time.time()
+        return path
+
+    def evict(self, max_size, keep=()):
+        """ Removes least recently used textures except keep ones until cache fits max_size in bytes """
+        textures = self.index['textures']
+        total = sum(entry['size'] for entry in textures.values())
+        for name in sorted(textures, key=lambda name: textures[name]['used']):
+            if total <= max_size:
+                break
+
+            if name in keep:
+                continue
+
+            (self.path / name).unlink(missing_ok=True)
+            total -= textures.pop(name)['size']
+
+        # dropping sources which refer to evicted textures
+        names = {name.partition('_')[0] for name in textures}
+        self.index['sources'] = {key: val for key, val in self.index['sources'].items() if val in names}
+
+    def save(self):
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.index_path.write_text(json.dumps(self.index), encoding='utf-8')
+        except OSError as e:
+            log.error("Failed to write texture cache index %s: %s", self.index_path, e)
+
+    def _content_hash(self, source):
+        stat = os.stat(source)
+        key = f"{source}|{stat.st_size}|{stat.st_mtime_ns}"
+        content_hash = self.index['sources'].get(key)
+        if content_hash:
+            return content_hash
+
+        sha = hashlib.sha1()
+        with open(source, 'rb') as f:
+            while chunk := f.read(2 ** 24):
+                sha.update(chunk)
+
+        content_hash = self.index['sources'][key] = sha.hexdigest()
+        return content_hash
+
+
+@functools.cache
+def _oiio():
+    try:
+        import OpenImageIO
+        return OpenImageIO
+    except ImportError:
+        log.warning("OpenImageIO python module isn't available, textures aren't cached")
+        return None
+
+
+def _make_texture(source, path, compression, max_size):
+    oiio = _oiio()
+    if not oiio:
+        return False
+
+    config = oiio.ImageSpec()
+    config.tile_width = config.tile_height = TILE_SIZE
+    config.attribute("compression", compression.lower())
+    config.attribute("maketx:filtername", "lanczos3")
+
+    image = oiio.ImageBuf(str(source))
+    spec = image.spec()
+    scale = max_size / max(spec.width, spec.height) if max_size else 1.0
+    if scale < 1.0:
+        roi = oiio.ROI(0, max(int(spec.width * scale), 1), 0, max(int(spec.height * scale), 1),
+                       0, 1, 0, spec.nchannels)
+        image = oiio.ImageBufAlgo.resize(image, roi=roi)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"tmp_{path.name}")
+    start_time = time.perf_counter()
+    if not oiio.ImageBufAlgo.make_texture(oiio.MakeTxTexture, image, str(tmp_path), config):
+        log.error("Failed to convert texture %s: %s", source, oiio.geterror())
+        tmp_path.unlink(missing_ok=True)
+        return False
+
+    tmp_path.replace(path)
+    log.debug("Texture %s is converted in %.2fs", source, time.perf_counter() - start_time)
+    return True
+
+
+# "path|size|mtime" of image file -> its resolution
+_resolutions = {}
+
+
+def image_resolution(image):
+    """ Returns (width, height, channels, bytes per channel) of image file without loading pixels """
+    source = image_source(image)
+    stat = source.stat()
+    key = f"{source}|{stat.st_size}|{stat.st_mtime_ns}"
+    resolution = _resolutions.get(key)
+    if resolution:
+        return resolution
+
+    resolution = None
+    oiio = _oiio()
+    if oiio:
+        image_input = oiio.ImageInput.open(str(source))
+        if image_input:
+            spec = image_input.spec()
+            image_input.close()
+            resolution = spec.width, spec.height, spec.nchannels, spec.format.size()
+
+    if not resolution:
+        resolution = *image.size, image.channels, 4 if image.is_float else 1
+
+    _resolutions[key] = resolution
+    return resolution
+
+
+def fit_texture_size(resolutions, budget):
+    """
+    Returns the largest power of 2 texture size, to which textures have to be downscaled to fit budget
+    in bytes, 0 if textures fit budget without downscaling
+    """
+    def memory(max_size):
+        total = 0
+        for width, height, channels, channel_size in resolutions:
+            scale = min(max_size / max(width, height, 1), 1.0) if max_size else 1.0
+            total += int(width * scale) * int(height * scale) * channels * channel_size
+        return total
+
+    if memory(0) <= budget:
+        return 0
+
+    max_size = 2 ** math.ceil(math.log2(max(max(width, height) for width, height, *_ in resolutions)))
+    while max_size > MIN_TEXTURE_SIZE and memory(max_size) > budget:
+        max_size //= 2
+
+    return max_size
+
+
+def image_source(image):
+    return Path(bpy.path.abspath(image.filepath_raw, library=image.library))
+
+
+def scene_images(depsgraph):
+    """
+    Pairs of original and evaluated file images used by scene. Linked images are skipped,
+    as well as images which are already textures.
+    """
+    for id in depsgraph.ids:
+        if not isinstance(id, bpy.types.Image):
+            continue
+
+        image = id.original
+        if image.source == 'FILE' and not image.packed_file and not image.library \
+                and not image.filepath_raw.endswith(TEXTURE_EXT):
+            yield image, id
+
+
+_caches = {}
+
+
+def get_texture_cache(directory):
+    """ Texture cache is shared by all engines using the same directory """
+    cache = _caches.get(directory)
+    if not cache:
+        cache = _caches[directory] = TextureCache(directory)
+
+    return cache
+
+
+# estimated memory of textures, size they were limited to and number of actually downscaled textures
+# on the last sync, per engine type
+texture_stats = {}
+
+# engine type -> budget, cache settings and images of the last sync
+_synced_states = {}
+
+
+def use_cached_textures(depsgraph, settings, engine_type, memory_budget=0, full_sync=True):
+    """
+    Points evaluated scene images to cached textures before scene is synced to delegate, original
+    images aren't changed. With non zero memory_budget in bytes textures are downscaled to fit it.
+    Without full_sync images are processed again only if they or the settings were changed.
+    Returns the texture cache or None if it isn't used.
+    """
+    images = list(scene_images(depsgraph))
+    state = (memory_budget, settings.enable, settings.directory, settings.compression,
+             frozenset(image.name_full for image, _ in images))
+    if not full_sync and _synced_states.get(engine_type) == state and not depsgraph.id_type_updated('IMAGE'):
+        return None
+
+    _synced_states[engine_type] = state
+
+    images = [(image, evaluated) for image, evaluated in images if image_source(image).is_file()]
+    resolutions = {}
+    max_size = 0
+    if memory_budget:
+        resolutions = {image.name_full: image_resolution(image) for image, _ in images}
+        max_size = fit_texture_size(list(resolutions.values()), memory_budget)
+        texture_stats[engine_type] = {
+            'memory': sum(width * height * channels * channel_size
+                          for width, height, channels, channel_size in resolutions.values()),
+            'max_size': max_size,
+            'downscaled': 0,
+        }
+
+    cache = get_texture_cache(settings.directory) if settings.enable or max_size else None
+    downscaled = 0
+    for image, evaluated in images:
+        downscale = max_size and max(resolutions[image.name_full][:2]) > max_size
+        # only textures which have to be downscaled are converted without enabled cache
+        path = cache.get(image_source(image), settings.compression, max_size if downscale else 0) \
+            if settings.enable or downscale else None
+        if path:
+            evaluated.filepath_raw = str(path)
+            downscaled += bool(downscale)
+        elif evaluated.filepath_raw != image.filepath_raw:
+            # texture of the previous sync isn't used anymore
+            evaluated.filepath_raw = image.filepath_raw
+
+    if not cache:
+        return None
+
+    if downscaled:
+        texture_stats[engine_type]['downscaled'] = downscaled
+        log.info("%d textures are downscaled to %d to fit memory budget %.1f GB",
+                 downscaled, max_size, memory_budget / 2 ** 30)
+
+    cache.evict(int(settings.max_size * 2 ** 30),
+                {Path(evaluated.filepath_raw).name for _, evaluated in images})
+    cache.save()
+    return cache
@@ -15,6 +15,8 @@
 import bpy
 
 from .engine import RPRHydraRenderEngine
+from .texture_cache import texture_stats
+from .utils import get_memory_usage, format_memory
 
 
 class Panel(bpy.types.Panel):
@@ -28,6 +30,22 @@ class Panel(bpy.types.Panel):
         return context.engine in cls.COMPAT_ENGINES
 
 
+def draw_memory(layout, settings, engine_type):
+    """ Draws memory budget and current memory usage """
+    layout.prop(settings, "memory_budget")
+
+    current, peak = get_memory_usage()
+    col = layout.column(align=True)
+    col.label(text=f"Memory: {format_memory(current)}, peak {format_memory(peak)}")
+
+    stats = texture_stats.get(engine_type)
+    if stats:
+        text = f"Textures: {format_memory(stats['memory'])}"
+        if stats['downscaled']:
+            text += f", {stats['downscaled']} downscaled to {stats['max_size']} px"
+        col.label(text=text)
+
+
 class RPR_HYDRA_RENDER_PT_final(Panel):
     bl_idname = 'RPR_HYDRA_RENDER_PT_final'
     bl_label = "RPR Final Settings"
@@ -40,9 +58,12 @@ class RPR_HYDRA_RENDER_PT_final(Panel):
         layout.use_property_decorate = False
 
         col = layout.column()
+        col.prop(settings, "device")
         col.prop(settings, "render_quality")
         col.prop(settings, "render_mode")
 
+        draw_memory(layout, settings, 'FINAL')
+
 
 class FinalPanel(bpy.types.Panel):
     bl_parent_id = RPR_HYDRA_RENDER_PT_final.bl_idname
@@ -63,6 +84,10 @@ class RPR_HYDRA_RENDER_PT_samples_final(FinalPanel):
         layout.use_property_decorate = False
 
         settings = self.settings(context)
+        row = layout.row(align=True)
+        row.prop(settings, "preset")
+        row.operator("hydra_rpr.calibrate_preset", text="", icon='TIME')
+
         layout.prop(settings, "max_samples")
 
         col = layout.column(align=True)
@@ -71,6 +96,15 @@ class RPR_HYDRA_RENDER_PT_samples_final(FinalPanel):
         row.enabled = settings.variance_threshold > 0.0
         row.prop(settings, "min_adaptive_samples")
 
+        layout.prop(settings, "time_limit")
+
+        col = layout.column(heading="Checkpoints")
+        col.prop(settings, "enable_checkpoints", text="Enable")
+        sub = col.column()
+        sub.enabled = settings.enable_checkpoints
+        sub.prop(settings, "checkpoint_dir", text="Directory")
+        sub.prop(settings, "checkpoint_interval", text="Interval")
+
 
 class RPR_HYDRA_RENDER_PT_quality_final(FinalPanel):
     bl_label = "Quality"
@@ -107,8 +141,13 @@ class RPR_HYDRA_RENDER_PT_denoise_final(FinalPanel):
         denoise = self.settings(context).denoise
 
         layout.enabled = denoise.enable
-        layout.prop(denoise, "min_iter")
-        layout.prop(denoise, "iter_step")
+        layout.prop(denoise, "schedule")
+        col = layout.column()
+        col.enabled = denoise.schedule != 'FINAL'
+        col.prop(denoise, "min_iter")
+        row = col.row()
+        row.enabled = denoise.schedule == 'FIXED'
+        row.prop(denoise, "iter_step")
 
 
 class RPR_HYDRA_RENDER_PT_film_final(FinalPanel):
@@ -122,6 +161,52 @@ class RPR_HYDRA_RENDER_PT_film_final(FinalPanel):
         layout.prop(self.settings(context), "enable_alpha", text="Transparent Background")
 
 
+class RPR_HYDRA_RENDER_PT_motion_blur_final(FinalPanel):
+    bl_label = "Motion Blur"
+
+    def draw_header(self, context):
+        self.layout.prop(context.scene.render, "use_motion_blur", text="")
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        settings = self.settings(context)
+
+        layout.enabled = context.scene.render.use_motion_blur
+        layout.prop(context.scene.render, "motion_blur_shutter")
+        layout.prop(settings, "enable_motion_blur", text="Beauty Motion Blur")
+
+
+class RPR_HYDRA_RENDER_PT_performance_final(FinalPanel):
+    bl_label = "Performance"
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        settings = self.settings(context)
+
+        layout.prop(context.scene.render, "use_persistent_data", text="Persistent Data")
+
+        col = layout.column(align=True)
+        row = col.row()
+        row.enabled = settings.device != 'GPU'
+        row.prop(settings, "cpu_threads", text="Threads")
+        col.prop(settings, "cpu_affinity", text="Affinity")
+
+        col = layout.column(heading="Tiling")
+        col.prop(settings, "enable_tiles", text="Use Tiling")
+        sub = col.column()
+        sub.enabled = settings.enable_tiles or settings.enable_checkpoints
+        sub.prop(settings, "tile_size")
+
+        layout.prop(context.scene.hydra_rpr, "telemetry_log")
+        layout.operator("hydra_rpr.instance_duplicates", icon='LINKED')
+
+
 class RPR_HYDRA_RENDER_PT_pixel_filter_final(FinalPanel):
     bl_label = "Pixel Filter"
 
@@ -149,9 +234,12 @@ class RPR_HYDRA_RENDER_PT_viewport(Panel):
         layout.use_property_decorate = False
 
         settings = context.scene.hydra_rpr.viewport
+        layout.prop(settings, "device")
         layout.prop(settings, "render_quality")
         layout.prop(settings, "render_mode")
 
+        draw_memory(layout, settings, 'VIEWPORT')
+
 
 class ViewportPanel(bpy.types.Panel):
     bl_parent_id = RPR_HYDRA_RENDER_PT_viewport.bl_idname
@@ -172,6 +260,8 @@ class RPR_HYDRA_RENDER_PT_samples_viewport(ViewportPanel):
         layout.use_property_decorate = False
 
         settings = self.settings(context)
+        layout.prop(settings, "preset")
+
         layout.prop(settings, "max_samples")
 
         col = layout.column(align=True)
@@ -194,6 +284,30 @@ class RPR_HYDRA_RENDER_PT_quality_viewport(ViewportPanel):
         layout.prop(quality, "enable_downscale")
         layout.prop(quality, "resolution_downscale")
 
+        row = layout.row(heading="Target FPS")
+        row.prop(quality, "enable_target_fps", text="")
+        sub = row.row()
+        sub.enabled = quality.enable_target_fps
+        sub.prop(quality, "target_fps")
+
+        layout.prop(quality, "enable_progressive_refinement")
+        col = layout.column(align=True)
+        col.enabled = quality.enable_progressive_refinement
+        col.prop(quality, "navigation_downscale")
+        col.prop(quality, "refinement_time")
+
+        layout.prop(quality, "enable_idle_throttle")
+        col = layout.column(align=True)
+        col.enabled = quality.enable_idle_throttle
+        col.prop(quality, "idle_timeout")
+        col.prop(quality, "idle_cpus")
+
+        layout.prop(quality, "enable_proxies")
+        row = layout.row(align=True)
+        row.enabled = quality.enable_proxies
+        row.prop(quality, "triangle_budget")
+        row.operator("hydra_rpr.update_proxies", text="", icon='FILE_REFRESH')
+
 
 class RPR_HYDRA_RENDER_PT_denoise_viewport(ViewportPanel):
     bl_label = ""
@@ -208,8 +322,13 @@ class RPR_HYDRA_RENDER_PT_denoise_viewport(ViewportPanel):
 
         denoise = self.settings(context).denoise
         layout.enabled = denoise.enable
-        layout.prop(denoise, "min_iter")
-        layout.prop(denoise, "iter_step")
+        layout.prop(denoise, "schedule")
+        col = layout.column()
+        col.enabled = denoise.schedule != 'FINAL'
+        col.prop(denoise, "min_iter")
+        row = col.row()
+        row.enabled = denoise.schedule == 'FIXED'
+        row.prop(denoise, "iter_step")
 
 
 class RPR_HYDRA_RENDER_PT_pixel_filter_viewport(ViewportPanel):
@@ -227,6 +346,54 @@ class RPR_HYDRA_RENDER_PT_pixel_filter_viewport(ViewportPanel):
         col.prop(self.settings(context).quality, "pixel_filter_width")
 
 
+class RPR_HYDRA_RENDER_PT_cache(Panel):
+    bl_label = "RPR Cache"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        texture_cache = context.scene.hydra_rpr.texture_cache
+
+        col = layout.column(heading="Textures")
+        col.prop(texture_cache, "enable", text="Use Cache")
+        sub = col.column()
+        sub.enabled = texture_cache.enable
+        sub.prop(texture_cache, "directory")
+        sub.prop(texture_cache, "max_size")
+        sub.prop(texture_cache, "compression")
+
+        preview = context.scene.hydra_rpr.preview
+
+        col = layout.column(heading="Previews")
+        col.prop(preview, "max_samples")
+        col.prop(preview, "max_ray_depth")
+        col.prop(preview, "enable_denoise")
+        col.prop(preview, "enable_cache", text="Use Cache")
+        sub = col.column()
+        sub.enabled = preview.enable_cache
+        sub.prop(preview, "cache_dir", text="Directory")
+
+
+class RPR_HYDRA_OBJECT_PT_proxy(Panel):
+    bl_label = "RPR Viewport Proxy"
+    bl_context = 'object'
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        return super().poll(context) and context.object and context.object.type == 'MESH'
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        layout.prop(context.object.hydra_rpr, "viewport_proxy", text="Proxy")
+
+
 class RPR_HYDRA_LIGHT_PT_light(Panel):
     """
     Physical light sources
@@ -306,6 +473,39 @@ class RPR_HYDRA_RENDER_PT_passes_data(Panel):
         col.prop(view_layer, "use_pass_z")
         col.prop(view_layer, "use_pass_normal")
         col.prop(view_layer, "use_pass_position")
+        col.prop(view_layer, "use_pass_vector")
+        col.prop(view_layer.hydra_rpr, "use_pass_variance")
+
+        col = layout.column(heading="IDs", align=True)
+        col.prop(view_layer.hydra_rpr, "use_pass_prim_id")
+        col.prop(view_layer.hydra_rpr, "use_pass_material_id")
+
+
+class RPR_HYDRA_RENDER_PT_passes_light(Panel):
+    bl_label = "Light"
+    bl_context = "view_layer"
+    bl_parent_id = "RPR_HYDRA_RENDER_PT_passes"
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        view_layer = context.view_layer
+
+        col = layout.column(heading="Diffuse", align=True)
+        col.prop(view_layer, "use_pass_diffuse_direct", text="Direct")
+        col.prop(view_layer, "use_pass_diffuse_indirect", text="Indirect")
+        col.prop(view_layer, "use_pass_diffuse_color", text="Color")
+
+        col = layout.column(heading="Glossy", align=True)
+        col.prop(view_layer, "use_pass_glossy_direct", text="Direct")
+        col.prop(view_layer, "use_pass_glossy_indirect", text="Indirect")
+
+        col = layout.column(heading="Other", align=True)
+        col.prop(view_layer, "use_pass_emit", text="Emission")
+        col.prop(view_layer, "use_pass_environment")
+        col.prop(view_layer, "use_pass_ambient_occlusion", text="Ambient Occlusion")
 
 
 register_classes, unregister_classes = bpy.utils.register_classes_factory((
@@ -314,6 +514,8 @@ register_classes, unregister_classes = bpy.utils.register_classes_factory((
     RPR_HYDRA_RENDER_PT_quality_final,
     RPR_HYDRA_RENDER_PT_denoise_final,
     RPR_HYDRA_RENDER_PT_film_final,
+    RPR_HYDRA_RENDER_PT_motion_blur_final,
+    RPR_HYDRA_RENDER_PT_performance_final,
     RPR_HYDRA_RENDER_PT_pixel_filter_final,
 
     RPR_HYDRA_RENDER_PT_viewport,
@@ -322,10 +524,14 @@ register_classes, unregister_classes = bpy.utils.register_classes_factory((
     RPR_HYDRA_RENDER_PT_denoise_viewport,
     RPR_HYDRA_RENDER_PT_pixel_filter_viewport,
 
+    RPR_HYDRA_RENDER_PT_cache,
+
+    RPR_HYDRA_OBJECT_PT_proxy,
     RPR_HYDRA_LIGHT_PT_light,
 
     RPR_HYDRA_RENDER_PT_passes,
     RPR_HYDRA_RENDER_PT_passes_data,
+    RPR_HYDRA_RENDER_PT_passes_light,
 ))
 
 
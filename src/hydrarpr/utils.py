@@ -0,0 +1,251 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import logging
+import platform
+
+
+OS = platform.system()
+
+log = logging.getLogger("hydrarpr")
+
+
+def get_memory_usage():
+    """ Returns (current, peak) host memory used by Blender process in bytes, None if unknown """
+    if OS == 'Windows':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None, None
+
+        return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+    if OS == 'Linux':
+        status = {}
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, val = line.partition(':')
+                if key in ('VmRSS', 'VmHWM'):
+                    status[key] = int(val.split()[0]) * 1024
+
+        return status.get('VmRSS'), status.get('VmHWM')
+
+    import resource
+    # on macOS ru_maxrss is in bytes
+    return None, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def reset_peak_memory():
+    """ Resets peak memory counter of the process, supported only on Linux """
+    if OS != 'Linux':
+        return
+
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def format_memory(size):
+    if size is None:
+        return "N/A"
+
+    return f"{size / 2 ** 20:.0f} MB"
+
+
+def parse_cpu_list(cpu_list):
+    """ Parses CPU list string like '0-7,12,14' to set of CPU indices """
+    cpus = set()
+    for part in cpu_list.replace(' ', '').split(','):
+        if not part:
+            continue
+
+        start, _, end = part.partition('-')
+        cpus.update(range(int(start), int(end or start) + 1))
+
+    return cpus
+
+
+_default_cpu_affinity = None
+
+
+def get_cpu_affinity():
+    """ Returns set of CPUs which Blender process is pinned to, None if unknown """
+    if OS == 'Linux':
+        import os
+        return os.sched_getaffinity(0)
+
+    if OS == 'Windows':
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        process_mask = ctypes.c_size_t()
+        system_mask = ctypes.c_size_t()
+        kernel32.GetProcessAffinityMask(kernel32.GetCurrentProcess(),
+                                        ctypes.byref(process_mask), ctypes.byref(system_mask))
+        return {cpu for cpu in range(process_mask.value.bit_length()) if process_mask.value & (1 << cpu)}
+
+    return None
+
+
+def set_cpu_affinity(cpus):
+    """
+    Pins all threads of Blender process to CPUs, threads created afterwards inherit it.
+    Empty cpus restores affinity which was before the first call.
+    """
+    global _default_cpu_affinity
+
+    if not cpus and _default_cpu_affinity is None:
+        # affinity was never changed
+        return
+
+    if OS == 'Linux':
+        import os
+
+        if _default_cpu_affinity is None:
+            _default_cpu_affinity = os.sched_getaffinity(0)
+
+        # on Linux affinity is set per thread
+        set_thread_affinity(get_thread_ids(), cpus or _default_cpu_affinity)
+
+    elif OS == 'Windows':
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        process = kernel32.GetCurrentProcess()
+        if _default_cpu_affinity is None:
+            process_mask = ctypes.c_size_t()
+            system_mask = ctypes.c_size_t()
+            kernel32.GetProcessAffinityMask(process, ctypes.byref(process_mask), ctypes.byref(system_mask))
+            _default_cpu_affinity = process_mask.value
+
+        mask = sum(1 << cpu for cpu in cpus) if cpus else _default_cpu_affinity
+        if not kernel32.SetProcessAffinityMask(process, ctypes.c_size_t(mask)):
+            raise OSError(f"Failed to set CPU affinity mask {mask:#x}")
+
+    else:
+        log.warning("CPU affinity isn't supported on %s", OS)
+
+
+def get_thread_ids():
+    """ Returns set of native ids of threads of Blender process, empty set if unknown """
+    if OS == 'Linux':
+        import os
+        return {int(tid) for tid in os.listdir("/proc/self/task")}
+
+    if OS == 'Windows':
+        import ctypes
+        from ctypes import wintypes
+
+        class THREADENTRY32(ctypes.Structure):
+            _fields_ = [
+                ('dwSize', wintypes.DWORD),
+                ('cntUsage', wintypes.DWORD),
+                ('th32ThreadID', wintypes.DWORD),
+                ('th32OwnerProcessID', wintypes.DWORD),
+                ('tpBasePri', wintypes.LONG),
+                ('tpDeltaPri', wintypes.LONG),
+                ('dwFlags', wintypes.DWORD),
+            ]
+
+        TH32CS_SNAPTHREAD = 0x4
+        kernel32 = ctypes.windll.kernel32
+        kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+        snapshot = wintypes.HANDLE(kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPTHREAD, 0))
+        if snapshot.value == wintypes.HANDLE(-1).value:
+            raise OSError("Failed to enumerate threads")
+
+        tids = set()
+        try:
+            pid = kernel32.GetCurrentProcessId()
+            entry = THREADENTRY32()
+            entry.dwSize = ctypes.sizeof(THREADENTRY32)
+            found = kernel32.Thread32First(snapshot, ctypes.byref(entry))
+            while found:
+                if entry.th32OwnerProcessID == pid:
+                    tids.add(entry.th32ThreadID)
+                found = kernel32.Thread32Next(snapshot, ctypes.byref(entry))
+
+        finally:
+            kernel32.CloseHandle(snapshot)
+
+        return tids
+
+    return set()
+
+
+def set_thread_affinity(tids, cpus):
+    """ Pins threads of Blender process to CPUs, threads which have already exited are skipped """
+    if OS == 'Linux':
+        import os
+
+        for tid in tids:
+            try:
+                os.sched_setaffinity(tid, cpus)
+            except ProcessLookupError:
+                pass
+
+    elif OS == 'Windows':
+        import ctypes
+        from ctypes import wintypes
+
+        THREAD_SET_INFORMATION = 0x20
+        THREAD_QUERY_INFORMATION = 0x40
+        kernel32 = ctypes.windll.kernel32
+        kernel32.OpenThread.restype = wintypes.HANDLE
+        mask = ctypes.c_size_t(sum(1 << cpu for cpu in cpus))
+        for tid in tids:
+            thread = wintypes.HANDLE(kernel32.OpenThread(THREAD_SET_INFORMATION | THREAD_QUERY_INFORMATION,
+                                                         False, tid))
+            if not thread.value:
+                continue
+
+            kernel32.SetThreadAffinityMask(thread, mask)
+            kernel32.CloseHandle(thread)
+
+    else:
+        log.warning("CPU affinity isn't supported on %s", OS)
+
+
+def is_window_focused():
+    """ Returns False if Blender window isn't in foreground, supported only on Windows """
+    if OS != 'Windows':
+        return True
+
+    import ctypes
+    import os
+
+    user32 = ctypes.windll.user32
+    pid = ctypes.c_ulong()
+    user32.GetWindowThreadProcessId(user32.GetForegroundWindow(), ctypes.byref(pid))
+    return pid.value == os.getpid()
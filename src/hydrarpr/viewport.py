@@ -0,0 +1,159 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import math
+import time
+
+
+# time without camera movement after which viewport is considered idle, in seconds
+IDLE_TIME = 0.3
+# weight of the latest measured frame time in the averaged frame time
+FRAME_TIME_SMOOTHING = 0.3
+
+
+class ViewportState:
+    """ Tracks viewport camera movement and frame times during navigation """
+
+    def __init__(self):
+        self.perspective_matrix = None
+        self.last_draw_time = None
+        self.last_move_time = None
+        self.frame_time = 0.0
+
+    def update(self, region_data):
+        """ Registers drawn frame, returns True if camera was moved since the previous frame """
+        now = time.perf_counter()
+
+        if self.perspective_matrix is None:
+            # the first frame of viewport isn't a camera move
+            self.perspective_matrix = region_data.perspective_matrix.copy()
+            self.last_draw_time = now
+            return False
+
+        moved = region_data.perspective_matrix != self.perspective_matrix
+        if moved:
+            # frame times are measured only between frames of continuous navigation
+            if self.is_navigating:
+                frame_time = now - self.last_draw_time
+                self.frame_time = frame_time if not self.frame_time else \
+                    self.frame_time + (frame_time - self.frame_time) * FRAME_TIME_SMOOTHING
+
+            self.perspective_matrix = region_data.perspective_matrix.copy()
+            self.last_move_time = now
+
+        self.last_draw_time = now
+        return moved
+
+    @property
+    def idle_time(self):
+        if self.last_move_time is None:
+            return math.inf
+
+        return time.perf_counter() - self.last_move_time
+
+    @property
+    def is_navigating(self):
+        return self.idle_time < IDLE_TIME
+
+    def reset_frame_time(self):
+        self.frame_time = 0.0
+
+
+class IdleThrottle:
+    """ Decides when idle or unfocused viewport has to drop to low power state """
+
+    def __init__(self):
+        self.last_activity_time = time.perf_counter()
+        self.is_throttled = False
+
+    def activity(self):
+        """ Registers user interaction with viewport """
+        self.last_activity_time = time.perf_counter()
+
+    def update(self, enabled, timeout, is_focused):
+        """ Returns True if throttled state was changed """
+        throttled = enabled and (not is_focused or time.perf_counter() - self.last_activity_time > timeout)
+        if throttled == self.is_throttled:
+            return False
+
+        self.is_throttled = throttled
+        return True
+
+
+class FrameTimeGovernor:
+    """ Lowers viewport quality step by step to keep frame rate during navigation """
+
+    MAX_LEVEL = 5
+    # allowed deviation of frame time from the target one before quality level is changed
+    TOLERANCE = 0.25
+
+    def __init__(self):
+        self.level = 0
+
+    def update(self, state: ViewportState, target_fps):
+        """ Updates quality level, returns True if it was changed """
+        level = self.level
+        if not state.is_navigating:
+            # camera is idle: returning to full quality
+            self.level = 0
+
+        elif state.frame_time:
+            target_time = 1.0 / target_fps
+            if state.frame_time > target_time * (1.0 + self.TOLERANCE):
+                self.level = min(self.level + 1, self.MAX_LEVEL)
+            elif state.frame_time < target_time * (1.0 - self.TOLERANCE):
+                self.level = max(self.level - 1, 0)
+
+        if self.level == level:
+            return False
+
+        # frame time has to be measured again with new quality level
+        state.reset_frame_time()
+        return True
+
+    def apply(self, max_ray_depth, enable_downscale, resolution_downscale):
+        """ Returns interactive quality values lowered according to current level """
+        if self.level == 0:
+            return max_ray_depth, enable_downscale, resolution_downscale
+
+        if not enable_downscale:
+            resolution_downscale = 0
+
+        return (max(max_ray_depth - self.level, 1),
+                True,
+                min(resolution_downscale + self.level, 10))
+
+
+def refine_quality(state: ViewportState, values, navigation_downscale, refinement_time):
+    """
+    Progressive refinement schedule: during navigation returns the coarsest quality values,
+    then steps them up to the given ones over refinement_time seconds after camera stops.
+    Returns quality values and whether they are fully refined.
+    """
+    max_ray_depth, enable_downscale, resolution_downscale = values
+    if not enable_downscale:
+        resolution_downscale = 0
+
+    navigation_downscale = max(navigation_downscale, resolution_downscale)
+    if state.is_navigating:
+        return (1, True, navigation_downscale), False
+
+    progress = (state.idle_time - IDLE_TIME) / refinement_time if refinement_time > 0.0 else 1.0
+    if progress >= 1.0:
+        return values, True
+
+    return (1 + math.floor((max_ray_depth - 1) * progress),
+            True,
+            navigation_downscale - math.floor((navigation_downscale - resolution_downscale) * progress)), \
+        False
@@ -0,0 +1,272 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+"""
+Local frame scheduler for Hydra RPR addon.
+
+Splits frame range or frame tiles across N background Blender worker processes, which render
+with 'final' settings of scene.hydra_rpr. Example:
+
+    python hydrarpr_scheduler.py scene.blend -blender /opt/blender/blender -frames 1-250 -workers 8
+"""
+import argparse
+import collections
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+
+ENGINE_ID = 'RPRHydraRenderEngine'
+
+
+class Task:
+    def __init__(self, frame, tile=None):
+        self.frame = frame
+        self.tile = tile    # (index, min_x, min_y, max_x, max_y) in relative border coordinates
+        self.attempts = 0
+        self.time = 0.0
+
+    def __str__(self):
+        return f"frame {self.frame}" if self.tile is None else f"frame {self.frame} tile {self.tile[0]}"
+
+
+class WorkStealingQueue:
+    """
+    Each worker takes tasks from the head of its own queue. When own queue is empty worker
+    steals task from the tail of the longest queue of other workers.
+    """
+
+    def __init__(self, tasks, workers_count):
+        # splitting tasks into contiguous chunks, so every worker renders neighbour frames
+        self.queues = [collections.deque() for _ in range(workers_count)]
+        chunk = -(-len(tasks) // workers_count)
+        for i, task in enumerate(tasks):
+            self.queues[i // chunk].append(task)
+
+        self.lock = threading.Lock()
+        self.steals = 0
+
+    def pop(self, worker):
+        with self.lock:
+            if self.queues[worker]:
+                return self.queues[worker].popleft()
+
+            victim = max(self.queues, key=len)
+            if not victim:
+                return None
+
+            self.steals += 1
+            return victim.pop()
+
+    def push(self, worker, task):
+        with self.lock:
+            self.queues[worker].appendleft(task)
+
+
+def parse_frames(frames_str):
+    """ Parses frames string like '1-10,15,20-30x2' """
+    frames = []
+    for part in frames_str.split(','):
+        part, _, step = part.partition('x')
+        start, _, end = part.partition('-')
+        frames.extend(range(int(start), int(end or start) + 1, int(step or 1)))
+
+    return frames
+
+
+def make_tiles(tiles_x, tiles_y):
+    return [(y * tiles_x + x, x / tiles_x, y / tiles_y, (x + 1) / tiles_x, (y + 1) / tiles_y)
+            for y in range(tiles_y) for x in range(tiles_x)]
+
+
+def worker_cpus(slot, cpus_per_worker):
+    """ CPUs of worker slot on its host, consecutive range of cpus_per_worker CPUs """
+    return range(slot * cpus_per_worker, (slot + 1) * cpus_per_worker)
+
+
+def task_command(args, task, cpus=None):
+    cmd = [args.blender, '-b', args.blend_file, '-E', ENGINE_ID]
+    if args.output:
+        cmd += ['-o', args.output]
+
+    expr = ""
+    if cpus:
+        # workers on the same host don't compete for CPUs
+        expr += (
+            "s = bpy.context.scene.hydra_rpr.final\n"
+            f"s.cpu_threads = {len(cpus)}\n"
+            f"s.cpu_affinity = '{cpus[0]}-{cpus[-1]}'\n"
+        )
+
+    if task.tile is not None:
+        index, min_x, min_y, max_x, max_y = task.tile
+        expr += (
+            "r = bpy.context.scene.render\n"
+            "r.use_border = True\n"
+            "r.use_crop_to_border = True\n"
+            f"r.border_min_x, r.border_min_y = {min_x}, {min_y}\n"
+            f"r.border_max_x, r.border_max_y = {max_x}, {max_y}\n"
+            f"r.filepath += 'tile{index}_'\n"
+        )
+
+    if expr:
+        cmd += ['--python-expr', "import bpy\n" + expr]
+
+    cmd += ['-f', str(task.frame)]
+    return cmd
+
+
+def run_worker(worker, host, cpus, args, queue, stats, stop):
+    while not stop.is_set():
+        task = queue.pop(worker)
+        if task is None:
+            return
+
+        cmd = task_command(args, task, cpus)
+        if host:
+            cmd = ['ssh', host, " ".join(shlex.quote(arg) for arg in cmd)]
+
+        task.attempts += 1
+        if args.dry_run:
+            print(f"Worker {worker}: {' '.join(shlex.quote(arg) for arg in cmd)}")
+            returncode = 0
+        else:
+            start = time.perf_counter()
+            proc = subprocess.run(cmd, stdout=subprocess.DEVNULL if not args.verbose else None,
+                                  stderr=subprocess.STDOUT)
+            task.time = time.perf_counter() - start
+            returncode = proc.returncode
+
+        with stats['lock']:
+            if returncode != 0 and stop.is_set():
+                # interrupted Blender process exits with error, task isn't retried
+                stats['interrupted'].append(task)
+                return
+
+            if returncode == 0:
+                stats['done'].append(task)
+                print(f"[{len(stats['done'])}/{stats['total']}] {task} rendered by worker {worker}"
+                      f"{' on ' + host if host else ''} in {task.time:.1f}s")
+                continue
+
+            if task.attempts <= args.retries:
+                stats['retries'] += 1
+                print(f"Worker {worker}: {task} failed with code {returncode}, "
+                      f"retrying ({task.attempts}/{args.retries})")
+            else:
+                stats['failed'].append(task)
+                print(f"Worker {worker}: {task} failed with code {returncode}")
+                continue
+
+        # retrying failed task on the same worker first, others may steal it
+        queue.push(worker, task)
+
+
+def print_summary(stats, workers_count, steals, total_time):
+    done = stats['done']
+    print(f"""
+-------------------------------------------------------------
+Rendered: {len(done)}/{stats['total']}, failed: {len(stats['failed'])}, retries: {stats['retries']}, \
+interrupted: {len(stats['interrupted'])}
+Workers: {workers_count}, steals: {steals}
+Total time: {total_time:.1f}s""")
+
+    if done:
+        render_time = sum(task.time for task in done)
+        print(f"Average task time: {render_time / len(done):.1f}s\n"
+              f"Throughput: {len(done) / total_time * 60:.2f} tasks/min\n"
+              f"Utilization: {render_time / (total_time * workers_count) * 100:.0f}%")
+
+    for task in stats['failed']:
+        print(f"Failed: {task}")
+
+    print("-------------------------------------------------------------")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render frame range with Hydra RPR in several "
+                                             "background Blender processes")
+
+    ap.add_argument("blend_file", type=str,
+                    help="Path to .blend file")
+    ap.add_argument("-blender", required=False, type=str, default="blender",
+                    help="Path to Blender executable")
+    ap.add_argument("-frames", required=True, type=str,
+                    help="Frames to render, for example: 1-100,120,200-300x2")
+    ap.add_argument("-tiles", required=False, type=int, nargs=2, default=None, metavar=('X', 'Y'),
+                    help="Split every frame into X by Y tiles, each tile is a separate task")
+    ap.add_argument("-workers", required=False, type=int, default=1,
+                    help="Number of worker processes per host")
+    ap.add_argument("-worker-cpus", required=False, type=int, default=0,
+                    help="Number of CPUs of every worker process, workers of a host are pinned to "
+                         "separate CPU ranges. By default CPUs of this machine are split evenly "
+                         "between workers of a host, remote hosts are assumed to have the same CPUs")
+    ap.add_argument("-hosts", required=False, type=str, default="",
+                    help="Comma separated list of hosts to run workers via ssh, "
+                         "the .blend file and Blender have to be available on the same paths")
+    ap.add_argument("-retries", required=False, type=int, default=2,
+                    help="Number of retries of failed task")
+    ap.add_argument("-output", required=False, type=str, default="",
+                    help="Output path, same as Blender -o argument")
+    ap.add_argument("-dry-run", required=False, action="store_true",
+                    help="Print worker commands without running them")
+    ap.add_argument("-verbose", required=False, action="store_true",
+                    help="Show output of worker processes")
+
+    args = ap.parse_args()
+
+    tiles = make_tiles(*args.tiles) if args.tiles else [None]
+    tasks = [Task(frame, tile) for frame in parse_frames(args.frames) for tile in tiles]
+
+    hosts = args.hosts.split(',') if args.hosts else [None]
+    cpus_per_worker = args.worker_cpus or (os.cpu_count() // args.workers if args.workers > 1 else 0)
+    workers = [(host, worker_cpus(slot, cpus_per_worker)) for host in hosts for slot in range(args.workers)]
+
+    queue = WorkStealingQueue(tasks, len(workers))
+    stats = {
+        'lock': threading.Lock(),
+        'total': len(tasks),
+        'done': [],
+        'failed': [],
+        'retries': 0,
+        'interrupted': [],
+    }
+    stop = threading.Event()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run_worker, args=(i, host, cpus, args, queue, stats, stop))
+               for i, (host, cpus) in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        print("Interrupted, waiting for running workers")
+        stop.set()
+        for q in queue.queues:
+            q.clear()
+        for thread in threads:
+            thread.join()
+
+    print_summary(stats, len(workers), queue.steals, time.perf_counter() - start)
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
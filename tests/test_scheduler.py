@@ -0,0 +1,114 @@
+# **********************************************************************
+# Copyright 2022 Advanced Micro Devices, Inc
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ********************************************************************
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import hydrarpr_scheduler as scheduler
+
+
+def make_args(**kwargs):
+    args = {'blender': "blender", 'blend_file': "scene.blend", 'output': "", 'retries': 2,
+            'dry_run': False, 'verbose': False}
+    return SimpleNamespace(**(args | kwargs))
+
+
+def make_stats(total):
+    return {'lock': threading.Lock(), 'total': total, 'done': [], 'failed': [], 'retries': 0,
+            'interrupted': []}
+
+
+def test_parse_frames():
+    assert scheduler.parse_frames("1-3,7,10-14x2") == [1, 2, 3, 7, 10, 12, 14]
+    assert scheduler.parse_frames("5") == [5]
+
+
+def test_make_tiles():
+    tiles = scheduler.make_tiles(2, 2)
+    assert [tile[0] for tile in tiles] == [0, 1, 2, 3]
+    assert tiles[3] == (3, 0.5, 0.5, 1.0, 1.0)
+
+
+def test_queue_splits_tasks_into_chunks():
+    queue = scheduler.WorkStealingQueue(list(range(10)), 3)
+    assert [list(q) for q in queue.queues] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_queue_steals_from_tail_of_longest_queue():
+    queue = scheduler.WorkStealingQueue(list(range(6)), 2)
+    for _ in range(3):
+        queue.pop(0)
+
+    assert queue.pop(0) == 5
+    assert queue.steals == 1
+    assert [queue.pop(1) for _ in range(3)] == [3, 4, None]
+
+
+def test_queue_push_returns_task_to_head():
+    queue = scheduler.WorkStealingQueue([1, 2], 1)
+    task = queue.pop(0)
+    queue.push(0, task)
+    assert queue.pop(0) == task
+
+
+def test_worker_cpus():
+    assert list(scheduler.worker_cpus(0, 4)) == [0, 1, 2, 3]
+    assert list(scheduler.worker_cpus(2, 4)) == [8, 9, 10, 11]
+    assert not scheduler.worker_cpus(1, 0)
+
+
+def test_task_command_sets_cpus_and_tile():
+    task = scheduler.Task(12, (3, 0.5, 0.5, 1.0, 1.0))
+    cmd = scheduler.task_command(make_args(), task, scheduler.worker_cpus(1, 8))
+    expr = cmd[cmd.index('--python-expr') + 1]
+    assert "s.cpu_threads = 8" in expr
+    assert "s.cpu_affinity = '8-15'" in expr
+    assert "r.border_min_x, r.border_min_y = 0.5, 0.5" in expr
+    assert cmd[-2:] == ['-f', "12"]
+
+
+def test_task_command_without_cpus_and_tile():
+    cmd = scheduler.task_command(make_args(), scheduler.Task(1))
+    assert '--python-expr' not in cmd
+
+
+def test_failed_task_is_retried(monkeypatch):
+    monkeypatch.setattr(scheduler.subprocess, 'run', lambda *args, **kwargs: SimpleNamespace(returncode=1))
+    queue = scheduler.WorkStealingQueue([scheduler.Task(1)], 1)
+    stats = make_stats(1)
+    scheduler.run_worker(0, None, None, make_args(retries=2), queue, stats, threading.Event())
+
+    assert stats['retries'] == 2
+    assert len(stats['failed']) == 1
+
+
+def test_interrupted_task_is_not_retried(monkeypatch):
+    stop = threading.Event()
+
+    def run(*args, **kwargs):
+        stop.set()
+        return SimpleNamespace(returncode=1)
+
+    monkeypatch.setattr(scheduler.subprocess, 'run', run)
+    queue = scheduler.WorkStealingQueue([scheduler.Task(1), scheduler.Task(2)], 1)
+    stats = make_stats(2)
+    scheduler.run_worker(0, None, None, make_args(), queue, stats, stop)
+
+    assert stats['retries'] == 0
+    assert [task.frame for task in stats['interrupted']] == [1]
+    assert not stats['failed']